@@ -1,22 +1,49 @@
 import ast
 import base64
-import json
 import os
 import socket
+import time
+from typing import TYPE_CHECKING
 
 import rsa
-from dotenv import load_dotenv
 
+from crypto_executor import default_executor
+from envelope import ENCRYPTION_FIELD, ENCRYPTION_HYBRID, CLIENT_TO_SERVER, SERVER_TO_CLIENT, unwrap_key, seal, \
+    unseal
+from framing import MessageStream, FRAMING_RAW
+from instrumentation import NULL_INSTRUMENTATION, RECEIVED, SENT, timed
 from json_keys import JsonKeys as jk
-from rev_crypt import generate_iden_num, mask, gcd_and_simpl, demask, unsign, sign_list, sign, pack_I_n_id
+from precompute import PrecomputeStore
+from rev_crypt import unsign, sign_crt, sign_list_crt, unsign_list, unsign_check_batch, demask_batch
+from settings import load_env
+from wire_codec import CODECS, DecimalCodec, INT_DECIMAL, int_width
 
-# env
-load_dotenv()
+if TYPE_CHECKING:
+    from connection_pool import ConnectionPool
+    from crypto_executor import CryptoExecutor
+    from instrumentation import Instrumentation
+    from key_pool import RSAKeyPool
+    from session_cache import SessionCache
 
 
 class REVClient:
-    def __init__(self, firstname: str, lastname: str, password: str):
-        self.socket = socket.create_connection((os.getenv("HOST"), int(os.getenv("PORT"))), timeout=180)
+    def __init__(self, firstname: str, lastname: str, password: str, key_pool: "RSAKeyPool | None" = None,
+                 session_cache: "SessionCache | None" = None, instrumentation: "Instrumentation | None" = None,
+                 connection_pool: "ConnectionPool | None" = None, crypto_executor: "CryptoExecutor | None" = None):
+        load_env()
+        self.instrumentation = instrumentation or NULL_INSTRUMENTATION
+        self.crypto = crypto_executor or default_executor()
+        self.last_request = None
+        self.connection_pool = connection_pool
+        self.stream = None
+        with self.instrumentation.stage("connect"):
+            if connection_pool is not None:
+                self.stream = connection_pool.acquire()
+            else:
+                self.stream = MessageStream.from_env(
+                    socket.create_connection((os.getenv("HOST"), int(os.getenv("PORT"))), timeout=180))
+                self.stream.negotiate(os.getenv("FRAMING", FRAMING_RAW))
+            self.socket = self.stream.socket
 
         # voter info
         self.firstname = firstname
@@ -26,6 +53,7 @@ class REVClient:
         # crypt protocol info
         self.n_id = None
         self.masking_factor = None
+        self.masking_inverse = None  # обратный маскирующий множитель для демаскирования
         self.iden_num_len = None
         self.iden_num = None  # I
         self.masked_iden_num = None  # I_m
@@ -33,6 +61,19 @@ class REVClient:
         self.M_1 = None  # M_1
         self.signed_masked_iden_num = None
         self.signed_iden_num = None  # I_s
+        self.codec = DecimalCodec  # кодирование больших чисел, согласуется при обмене ключами
+        self.message_key = None  # сеансовый ключ гибридного шифрования, согласуется при обмене ключами
+        self.send_sequence = 0  # номера следующих зашифрованных сообщений, см. set_message_key()
+        self.recv_sequence = 0
+
+        # batch blind signature info
+        self.iden_nums = []
+        self.masking_factors = []
+        self.signed_iden_nums = []
+        self.batch_timings = {}
+
+        # заранее вычисленные наборы для слепой подписи, см. start_precompute()
+        self.precompute = None
 
         # crypt keys
         self.client_private_key = None
@@ -53,45 +94,130 @@ class REVClient:
         self.server_blind_pubkey_e = None
         self.server_blind_pubkey_n = None
 
+        # session resumption
+        self.session_cache = session_cache
+        self.session_token = None
+
         # crypt key generate
-        self.generate_rsa_keys()
-        self.generate_blind_rsa_keys()
+        self.key_pool = key_pool
+        if not self.load_session():
+            self.generate_keys()
+        else:
+            self.start_precompute()
 
     def run(self):
-        self.rsa_key_exchange()
-        self.blind_rsa_key_exchange()
-
-        print("REG:", self.registration_handler())
-        print("AUTH:", self.authentication_handler())
-
-        print("BLIND_SIGN:", self.blind_signature_handler())
+        stage = self.resume_session()
+        if stage is None:
+            self.rsa_key_exchange()
+            self.blind_rsa_key_exchange()
+
+            print("REG:", self.registration_handler())
+            print("AUTH:", self.authentication_handler())
+            stage = jk.BLIND_SIGN
+        else:
+            print("RESUME:", stage)
+
+        if stage == jk.BLIND_SIGN:
+            print("BLIND_SIGN:", self.blind_signature_handler())
+
+    @timed("crypto.newkeys")
+    def newkeys(self, bits: int) -> tuple[rsa.PublicKey, rsa.PrivateKey]:
+        if self.key_pool is not None:
+            return self.key_pool.get(bits)
+        return self.crypto.run(rsa.newkeys, bits)
+
+    def generate_keys(self) -> None:
+        if self.key_pool is not None:
+            self.generate_rsa_keys()
+            self.generate_blind_rsa_keys()
+            return
+        # обе пары ключей генерируются одновременно, если исполнитель — пул
+        with self.instrumentation.stage("crypto.newkeys"):
+            keys = self.crypto.submit(rsa.newkeys, int(os.getenv("RSA_KEY_LEN")))
+            blind_keys = self.crypto.submit(rsa.newkeys, int(os.getenv("RSA_BLIND_KEY_LEN")))
+            self.set_rsa_keys(*keys.result())
+            self.set_blind_rsa_keys(*blind_keys.result())
 
     def generate_rsa_keys(self) -> None:
-        self.client_public_key, self.client_private_key = rsa.newkeys(int(os.getenv("RSA_KEY_LEN")))
+        self.set_rsa_keys(*self.newkeys(int(os.getenv("RSA_KEY_LEN"))))
+
+    def set_rsa_keys(self, public_key: rsa.PublicKey, private_key: rsa.PrivateKey) -> None:
+        self.client_public_key, self.client_private_key = public_key, private_key
 
         self.client_pubkey_n = self.client_public_key.n
         self.client_pubkey_e = self.client_public_key.e
         self.client_privkey_d = self.client_private_key.d
 
     def generate_blind_rsa_keys(self) -> None:
-        self.client_blind_public_key, self.client_blind_private_key = rsa.newkeys(int(os.getenv("RSA_BLIND_KEY_LEN")))
+        self.set_blind_rsa_keys(*self.newkeys(int(os.getenv("RSA_BLIND_KEY_LEN"))))
+
+    def set_blind_rsa_keys(self, public_key: rsa.PublicKey, private_key: rsa.PrivateKey) -> None:
+        self.client_blind_public_key, self.client_blind_private_key = public_key, private_key
 
         self.client_blind_pubkey_n = self.client_blind_public_key.n
         self.client_blind_pubkey_e = self.client_blind_public_key.e
         self.client_blind_privkey_d = self.client_blind_private_key.d
 
+    @timed("key_exchange")
     def rsa_key_exchange(self) -> None:
         send_data = {jk.REQUEST: jk.KEY_EXCHANGE,
                      jk.KEYEX_CLIENT_PUB_N: str(self.client_pubkey_n),
                      jk.KEYEX_CLIENT_PUB_E: str(self.client_pubkey_e)}
-        self.send_json(send_data)
+        int_encoding = os.getenv("INT_ENCODING", INT_DECIMAL)
+        if int_encoding != INT_DECIMAL:
+            send_data[jk.INT_ENCODING] = int_encoding
+        if os.getenv("MESSAGE_ENCRYPTION", ENCRYPTION_FIELD) == ENCRYPTION_HYBRID:
+            send_data[jk.ENCRYPTION] = ENCRYPTION_HYBRID
+        # обмен ключами начинает сессию заново и никогда не шифруется прежним сеансовым ключом
+        self.set_message_key(None)
+        self.send_json(send_data, encrypt=False)
 
         recv_data = self.recv_json()
-        self.server_pubkey_n = int(recv_data[jk.KEYEX_SERVER_PUB_N])
-        self.server_pubkey_e = int(recv_data[jk.KEYEX_SERVER_PUB_E])
+        self.codec = CODECS.get(recv_data.get(jk.INT_ENCODING), DecimalCodec)
+        if recv_data.get(jk.ENCRYPTION) == ENCRYPTION_HYBRID:
+            # дальнейшие сообщения шифруются целиком сеансовым ключом
+            self.unwrap_message_key(recv_data[jk.SESSION_KEY])
+        self.set_server_key(int(recv_data[jk.KEYEX_SERVER_PUB_N]), int(recv_data[jk.KEYEX_SERVER_PUB_E]))
+        self.start_precompute()
+
+    def set_message_key(self, key: bytes | None) -> None:
+        """Устанавливает сеансовый ключ гибридного шифрования; нумерация
+        сообщений в обоих направлениях начинается заново."""
+
+        self.message_key = key
+        self.send_sequence = 0
+        self.recv_sequence = 0
+
+    def unwrap_message_key(self, wrapped: str) -> None:
+        with self.instrumentation.stage("crypto.unwrap_key"):
+            self.set_message_key(self.crypto.run(unwrap_key, wrapped, self.client_private_key))
+
+    def start_precompute(self) -> None:
+        """Запускает фоновую подготовку наборов для слепой подписи (номер,
+        маскирующий множитель, замаскированный номер, обратный множитель):
+        для них нужен только открытый ключ сервера."""
+
+        if self.precompute is not None:
+            self.precompute.close()
+        self.precompute = PrecomputeStore.from_env(self.server_pubkey_e, self.server_pubkey_n,
+                                                   self.iden_num_len, self.crypto).start()
+
+    def blind_material(self, count: int) -> list:
+        """Наборы для слепой подписи из запаса; недостающие строятся на месте.
+        Сколько наборов было готово — ``self.precompute.metrics()``."""
+
+        if self.precompute is None:
+            self.precompute = PrecomputeStore.from_env(self.server_pubkey_e, self.server_pubkey_n,
+                                                       self.iden_num_len, self.crypto)
+        return self.precompute.take(count, self.iden_num_len)
+
+    def set_server_key(self, n: int, e: int) -> None:
+        self.server_pubkey_n = n
+        self.server_pubkey_e = e
         self.server_public_key = rsa.PublicKey(self.server_pubkey_n,
                                                self.server_pubkey_e)
 
+    @timed("blind_key_exchange")
     def blind_rsa_key_exchange(self) -> None:
         send_data = {jk.REQUEST: jk.BLIND_KEY_EXCHANGE,
                      jk.KEYEX_CLIENT_PUB_N: str(self.client_blind_pubkey_n),
@@ -99,11 +225,15 @@ class REVClient:
         self.send_json(send_data)
 
         recv_data = self.recv_json()
-        self.server_blind_pubkey_n = int(recv_data[jk.KEYEX_SERVER_PUB_N])
-        self.server_blind_pubkey_e = int(recv_data[jk.KEYEX_SERVER_PUB_E])
+        self.set_server_blind_key(int(recv_data[jk.KEYEX_SERVER_PUB_N]), int(recv_data[jk.KEYEX_SERVER_PUB_E]))
+
+    def set_server_blind_key(self, n: int, e: int) -> None:
+        self.server_blind_pubkey_n = n
+        self.server_blind_pubkey_e = e
         self.server_blind_public_key = rsa.PublicKey(self.server_blind_pubkey_n,
                                                      self.server_blind_pubkey_e)
 
+    @timed("registration")
     def registration_handler(self) -> bool:
         self.send_json(self.json_encrypt({jk.REQUEST: jk.REGISTRATION,
                                           jk.FIRSTNAME: self.firstname,
@@ -112,59 +242,131 @@ class REVClient:
         reg_data = self.json_decrypt(self.recv_json())
         return True if reg_data[jk.REG_STATE] in ["Successful", "Voter exists"] else False
 
+    @timed("authentication")
     def authentication_handler(self) -> bool:
         self.send_json(self.json_encrypt({jk.REQUEST: jk.AUTENTICATION,
                                           jk.FIRSTNAME: self.firstname,
                                           jk.LASTNAME: self.lastname,
                                           jk.PASSWORD: self.password}))
         auth_data = self.json_decrypt(self.recv_json())
-        return ast.literal_eval(auth_data[jk.AUTH_STATE])
+        auth = ast.literal_eval(auth_data[jk.AUTH_STATE])
+        if auth and auth_data.get(jk.SESSION_TOKEN):
+            self.session_token = auth_data[jk.SESSION_TOKEN]
+            self.save_session()
+        return auth
 
     def blind_signature_handler(self):
         # получение данных и генерация необходимых значений: iden_num, masking_factor
-        self.get_crypt_params()
-        self.iden_num = generate_iden_num(self.iden_num_len)
-        self.masking_factor = gcd_and_simpl(self.server_pubkey_n)
-
-        # маскирование iden_num => I_m
-        self.masked_iden_num = mask(self.iden_num,
-                                    self.masking_factor,
-                                    self.server_pubkey_e,
-                                    self.server_pubkey_n)
+        if self.n_id is None:
+            self.get_crypt_params()
+        self.blind_sign_request()
+        return self.blind_sign_confirm()
+
+    @timed("blind_sign")
+    def blind_sign_request(self) -> None:
+        # iden_num, masking_factor и замаскированный iden_num => I_m, подготовленные заранее
+        with self.instrumentation.stage("crypto.blind_material"):
+            [material] = self.blind_material(1)
+        self.iden_num = material.iden_num
+        self.masking_factor = material.masking_factor
+        self.masking_inverse = material.inverse
+        self.masked_iden_num = material.masked_iden_num
 
         # генерация криптограммы с иденфикационным номером для слепой подписи => [E(I_m, n_id)]
-        self.cryptogramm_I_n_id = sign(pack_I_n_id(self.masked_iden_num, self.n_id),
-                                       self.client_blind_privkey_d,
-                                       self.client_blind_pubkey_n)
+        with self.instrumentation.stage("crypto.sign"):
+            self.cryptogramm_I_n_id = self.crypto.run(sign_crt,
+                                                      self.codec.pack_I_n_id(self.masked_iden_num, self.n_id),
+                                                      self.client_blind_private_key)
 
         # протокольное сообщение для слепой подписи => [E(I_m, n_id), n_id]
         self.M_1 = [self.cryptogramm_I_n_id] + [self.n_id]
         self.send_json({jk.REQUEST: jk.BLIND_SIGN,
-                        jk.BLIND_MASK_IDEN_NUM: self.M_1})
+                        jk.BLIND_MASK_IDEN_NUM: [self.codec.encode(self.cryptogramm_I_n_id,
+                                                                   int_width(self.client_blind_pubkey_n)),
+                                                 self.n_id]})
 
         # подписанный iden_num => I_sm
-        self.signed_masked_iden_num = self.recv_json()[jk.BLIND_SIGN_RESPONSE]
+        response = self.recv_json()[jk.BLIND_SIGN_RESPONSE]
+        self.signed_masked_iden_num = response if response == jk.FAILED else self.codec.decode(response)
 
+    @timed("confirm")
+    def blind_sign_confirm(self):
         if self.signed_masked_iden_num != jk.FAILED:
             # демаскирование подписанного замаскированного iden_num
-            self.signed_iden_num = demask(self.signed_masked_iden_num,
-                                          self.masking_factor,
-                                          self.server_pubkey_n)
+            with self.instrumentation.stage("crypto.demask"):
+                # обратный множитель вычислен заранее: демаскирование — одно умножение
+                self.signed_iden_num = self.signed_masked_iden_num * self.masking_inverse % self.server_pubkey_n
 
             check = self.check_iden_num()  # проверка достоверности подписи
             # подтверждение валидности подписи
             self.send_json({jk.REQUEST: jk.BLIND_SIGN_CONFIRM_REQUEST,
                             jk.BLIND_SIGN_CONFIRM: check})
+            self.discard_session()
             return check
         else:
             self.send_json({jk.BLIND_SIGN_CONFIRM: False})
             return self.signed_masked_iden_num  # failed
 
+    @timed("blind_sign_batch")
+    def blind_signature_batch_handler(self, count: int):
+        timings = {}
+        start = time.perf_counter()
+
+        # запрос параметров — обмен с сервером, а не маскирование: учитывается отдельно
+        self.get_crypt_params()
+        timings["crypt_params"], start = time.perf_counter() - start, time.perf_counter()
+
+        materials = self.blind_material(count)
+        self.iden_nums = [material.iden_num for material in materials]
+        self.masking_factors = [material.masking_factor for material in materials]
+        masked_iden_nums = [material.masked_iden_num for material in materials]
+        timings["mask"], start = time.perf_counter() - start, time.perf_counter()
+
+        # криптограммы [E(I_m, n_id)] для всего пакета
+        packed = [self.codec.pack_I_n_id(masked_iden_num, self.n_id) for masked_iden_num in masked_iden_nums]
+        cryptogramms = self.crypto.run(sign_list_crt, packed, self.client_blind_private_key)
+        timings["sign"], start = time.perf_counter() - start, time.perf_counter()
+
+        width = int_width(self.client_blind_pubkey_n)
+        self.send_json({jk.REQUEST: jk.BLIND_SIGN_BATCH,
+                        jk.BLIND_MASK_IDEN_NUM: [[self.codec.encode(cryptogramm, width), self.n_id]
+                                                 for cryptogramm in cryptogramms]})
+        response = self.recv_json()[jk.BLIND_SIGN_RESPONSE]
+        timings["round_trip"], start = time.perf_counter() - start, time.perf_counter()
+
+        if response == jk.FAILED:
+            self.send_json({jk.BLIND_SIGN_CONFIRM: False})
+            self.batch_timings = timings
+            return response  # failed
+        signed_masked_iden_nums = [self.codec.decode(signed) for signed in response]
+
+        self.signed_iden_nums = demask_batch(signed_masked_iden_nums, self.masking_factors, self.server_pubkey_n,
+                                             [material.inverse for material in materials])
+        timings["demask"], start = time.perf_counter() - start, time.perf_counter()
+
+        check = self.crypto.run(unsign_check_batch, self.signed_iden_nums, self.iden_nums,
+                                self.server_pubkey_e, self.server_pubkey_n)
+        timings["verify"] = time.perf_counter() - start
+        timings["total"] = sum(timings.values())
+        self.batch_timings = timings
+
+        self.send_json({jk.REQUEST: jk.BLIND_SIGN_CONFIRM_REQUEST,
+                        jk.BLIND_SIGN_CONFIRM: check})
+        self.discard_session()
+        return check
+
+    def check_iden_nums(self) -> list[bool]:
+        unsigned = self.crypto.run(unsign_list, self.signed_iden_nums, self.server_pubkey_e, self.server_pubkey_n)
+        return [iden_num == msg for iden_num, msg in zip(self.iden_nums, unsigned)]
+
+    @timed("crypto.unsign")
     def check_iden_num(self):
-        return self.iden_num == unsign(self.signed_iden_num,
-                                       self.server_pubkey_e,
-                                       self.server_pubkey_n)
+        return self.iden_num == self.crypto.run(unsign,
+                                                self.signed_iden_num,
+                                                self.server_pubkey_e,
+                                                self.server_pubkey_n)
 
+    @timed("crypt_params")
     def get_crypt_params(self) -> None:
         self.send_json({jk.REQUEST: jk.CRYPT_STAGE_1_INIT,
                         jk.FIRSTNAME: self.firstname,
@@ -173,33 +375,146 @@ class REVClient:
 
         self.n_id = crypt_stage_1_data[jk.VOTER_ID]
         self.iden_num_len = crypt_stage_1_data[jk.IDEN_NUM_LEN]
+        if self.session_token is not None:
+            self.save_session()
+
+    def session_key(self) -> str:
+        return self.session_cache.voter_key(self.firstname, self.lastname)
+
+    def load_session(self) -> bool:
+        if self.session_cache is None:
+            return False
+        session = self.session_cache.get(self.session_key())
+        if session is None:
+            return False
+
+        private_key = rsa.PrivateKey.load_pkcs1(session["client_private_key"].encode())
+        self.set_rsa_keys(rsa.PublicKey(private_key.n, private_key.e), private_key)
+        blind_private_key = rsa.PrivateKey.load_pkcs1(session["client_blind_private_key"].encode())
+        self.set_blind_rsa_keys(rsa.PublicKey(blind_private_key.n, blind_private_key.e), blind_private_key)
+        self.set_server_key(*session["server_public_key"])
+        self.set_server_blind_key(*session["server_blind_public_key"])
+        self.session_token = session["session_token"]
+        self.n_id = session.get("n_id")
+        self.iden_num_len = session.get("iden_num_len")
+        self.codec = CODECS.get(session.get("int_encoding"), DecimalCodec)
+        return True
+
+    def save_session(self) -> None:
+        if self.session_cache is None:
+            return
+        self.session_cache.put(self.session_key(), {
+            "session_token": self.session_token,
+            "client_private_key": self.client_private_key.save_pkcs1().decode(),
+            "client_blind_private_key": self.client_blind_private_key.save_pkcs1().decode(),
+            "server_public_key": [self.server_pubkey_n, self.server_pubkey_e],
+            "server_blind_public_key": [self.server_blind_pubkey_n, self.server_blind_pubkey_e],
+            "n_id": self.n_id,
+            "iden_num_len": self.iden_num_len,
+            "int_encoding": self.codec.name})
+
+    def discard_session(self) -> None:
+        self.session_token = None
+        if self.session_cache is not None:
+            self.session_cache.discard(self.session_key())
+
+    @timed("resume")
+    def resume_session(self) -> str | None:
+        """Возобновляет сохранённую сессию без обмена ключами и аутентификации.
+
+        :return: этап, с которого продолжается протокол, или ``None``,
+            если сессию возобновить не удалось.
+        :rtype: str | None
+        """
+
+        if self.session_token is None:
+            return None
+        # новое соединение: сервер ещё не знает сеансовый ключ
+        self.send_json({jk.REQUEST: jk.RESUME,
+                        jk.SESSION_TOKEN: self.session_token}, encrypt=False)
+        recv_data = self.recv_json()
+        stage = recv_data.get(jk.RESUME_STATE, jk.FAILED)
+        if stage == jk.FAILED:
+            self.discard_session()
+            self.n_id = None
+            self.iden_num_len = None
+            # параметры из кэша относились к потерянной сессии и согласуются заново
+            self.set_message_key(None)
+            self.codec = DecimalCodec
+            return None
+        # в гибридном режиме сервер выдаёт новый сеансовый ключ: сообщения прежних соединений не повторить
+        if recv_data.get(jk.ENCRYPTION) == ENCRYPTION_HYBRID:
+            self.unwrap_message_key(recv_data[jk.SESSION_KEY])
+        else:
+            self.set_message_key(None)
+        return stage
 
+    @timed("crypto.json_encrypt")
     def json_encrypt(self, json_data: dict[str: str]) -> dict[str: str]:
+        if self.message_key is not None:
+            return dict(json_data)  # сообщение шифруется целиком в send_json()
         encrypt_dict = {}
         for item in json_data:
             if item == jk.PASSWORD:
-                encrypt = rsa.encrypt(str(json_data[item]).encode(), self.server_public_key)
+                encrypt = self.crypto.run(rsa.encrypt, str(json_data[item]).encode(), self.server_public_key)
                 encrypt_dict[item] = base64.b64encode(encrypt).decode()
             else:
                 encrypt_dict[item] = json_data[item]
         return encrypt_dict
 
+    @timed("crypto.json_decrypt")
     def json_decrypt(self, encrypt_json: dict[str: str]) -> dict[str: str]:
+        if self.message_key is not None:
+            return dict(encrypt_json)  # сообщение расшифровано целиком в recv_json()
         json_data = {}
         for item in encrypt_json:
             if item == jk.PASSWORD:
                 decode = base64.b64decode(encrypt_json[item])
-                json_data[item] = rsa.decrypt(decode, self.client_private_key).decode()
+                json_data[item] = self.crypto.run(rsa.decrypt, decode, self.client_private_key).decode()
             else:
                 json_data[item] = encrypt_json[item]
         return json_data
 
-    def send_json(self, message: dict[str: str]):
-        json_data = json.dumps(message)
-        self.socket.send(json_data.encode())
+    def send_json(self, message: dict[str: str], encrypt: bool = True):
+        self.last_request = message.get(jk.REQUEST, jk.BLIND_SIGN_CONFIRM)
+        if encrypt and self.message_key is not None:
+            with self.instrumentation.stage("crypto.seal"):
+                message = seal(self.message_key, message, CLIENT_TO_SERVER, self.send_sequence)
+            self.send_sequence += 1
+        with self.instrumentation.stage("net.send"):
+            nbytes = self.stream.send_json(message)
+        if self.instrumentation.enabled:
+            self.instrumentation.count_bytes(SENT, self.last_request, nbytes)
 
     def recv_json(self):
-        return json.loads(self.socket.recv(16384).decode())
+        with self.instrumentation.stage("net.recv"):
+            message = self.stream.recv_json()
+        if self.instrumentation.enabled:
+            # ответ относится к типу последнего отправленного запроса
+            self.instrumentation.count_bytes(RECEIVED, self.last_request, self.stream.last_frame_len)
+        if jk.ENCRYPTED in message:
+            with self.instrumentation.stage("crypto.unseal"):
+                message = unseal(self.message_key, message, SERVER_TO_CLIENT, self.recv_sequence)
+            self.recv_sequence += 1
+        return message
+
+    def close(self, discard: bool = False):
+        """Возвращает соединение в пул или закрывает его.
+
+        :param bool discard: не возвращать соединение в пул, например после ошибки протокола.
+        """
+
+        if self.precompute is not None:
+            self.precompute.close()
+        stream, self.stream = self.stream, None
+        if stream is None:
+            return
+        if self.connection_pool is not None:
+            self.connection_pool.release(stream, discard)
+        else:
+            stream.close()
 
     def __del__(self):
-        self.socket.close()
+        # клиент не закрыт явно — состояние обмена неизвестно, соединение в пул не возвращается
+        if getattr(self, "stream", None) is not None:
+            self.close(discard=True)
@@ -0,0 +1,327 @@
+import ast
+import asyncio
+import base64
+import json
+import os
+from concurrent.futures import Executor
+from typing import TYPE_CHECKING
+
+import rsa
+
+from crypto_executor import CRYPTO_INLINE, default_executor
+from envelope import ENCRYPTION_FIELD, ENCRYPTION_HYBRID, CLIENT_TO_SERVER, SERVER_TO_CLIENT, unwrap_key, seal, \
+    unseal
+from framing import FrameDecoder, encode_frame, FRAMING_RAW, MAX_FRAME_LEN, RECV_SIZE
+from json_keys import JsonKeys as jk
+from rev_crypt import generate_iden_num, mask, gcd_and_simpl, demask, unsign, sign_crt
+from settings import load_env
+from wire_codec import CODECS, DecimalCodec, INT_DECIMAL, int_width
+
+if TYPE_CHECKING:
+    from key_pool import RSAKeyPool
+
+STAGES = ("key_exchange", "blind_key_exchange", "registration", "authentication", "blind_sign")
+
+
+def _encrypt_field(value: str, public_key: rsa.PublicKey) -> str:
+    return base64.b64encode(rsa.encrypt(value.encode(), public_key)).decode()
+
+
+def _decrypt_field(value: str, private_key: rsa.PrivateKey) -> str:
+    return rsa.decrypt(base64.b64decode(value), private_key).decode()
+
+
+class AsyncMessageStream:
+    """Асинхронный аналог :py:class:`framing.MessageStream` поверх потоков asyncio.
+
+    :param asyncio.StreamReader reader: поток чтения.
+    :param asyncio.StreamWriter writer: поток записи.
+    :param str mode: режим кадрирования.
+    :param int max_frame: максимальный размер кадра в байтах.
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                 mode: str = FRAMING_RAW, max_frame: int = MAX_FRAME_LEN):
+        self.reader = reader
+        self.writer = writer
+        self.mode = mode
+        self.decoder = FrameDecoder(mode, max_frame)
+
+    async def negotiate(self, mode: str) -> str:
+        if mode == FRAMING_RAW:
+            return self.mode
+        await self.send_json({jk.REQUEST: jk.FRAMING, jk.FRAMING_MODE: mode})
+        if (await self.recv_json()).get(jk.FRAMING_MODE) == mode:
+            self.mode = self.decoder.mode = mode
+        return self.mode
+
+    async def send_json(self, message: dict) -> None:
+        self.writer.writelines(encode_frame(json.dumps(message).encode(), self.mode))
+        await self.writer.drain()
+
+    async def recv_json(self) -> dict:
+        while True:
+            frame = self.decoder.next_frame()
+            if frame is not None:
+                return json.loads(str(frame, "utf-8"))
+            data = await self.reader.read(RECV_SIZE)
+            if not data:
+                raise ConnectionError("connection closed by peer")
+            self.decoder.feed(data)
+
+    async def close(self) -> None:
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+class AsyncREVClient:
+    """Асинхронный клиент протокола голосования. Протокол и порядок
+    обработчиков совпадают с :py:class:`Client.REVClient`, включая
+    согласование ``INT_ENCODING`` и ``MESSAGE_ENCRYPTION``; ресурсоёмкие
+    операции RSA выполняются в ``executor``, поэтому на одном цикле событий
+    могут работать тысячи сессий.
+
+    :param str firstname: имя избирателя.
+    :param str lastname: фамилия избирателя.
+    :param str password: пароль избирателя.
+    :param RSAKeyPool key_pool: пул готовых ключей (необязательно).
+    :param Executor executor: исполнитель для криптографических операций;
+        ``None`` — :py:func:`crypto_executor.default_executor`, если в ``.env``
+        задан пул потоков или процессов, иначе исполнитель цикла событий по умолчанию.
+    :param dict[str, float] stage_timeouts: тайм-ауты этапов в секундах.
+    """
+
+    def __init__(self, firstname: str, lastname: str, password: str,
+                 key_pool: "RSAKeyPool | None" = None, executor: Executor | None = None,
+                 stage_timeouts: dict[str, float] | None = None):
+        load_env()
+        self.stream = None
+
+        # voter info
+        self.firstname = firstname
+        self.lastname = lastname
+        self.password = password
+
+        self.key_pool = key_pool
+        if executor is None and (os.getenv("CRYPTO_EXECUTOR") or CRYPTO_INLINE) != CRYPTO_INLINE:
+            executor = default_executor()
+        self.executor = executor
+        default_timeout = float(os.getenv("STAGE_TIMEOUT", 180))
+        self.stage_timeouts = {stage: default_timeout for stage in STAGES}
+        self.stage_timeouts.update(stage_timeouts or {})
+
+        # crypt protocol info
+        self.n_id = None
+        self.masking_factor = None
+        self.iden_num_len = None
+        self.iden_num = None  # I
+        self.masked_iden_num = None  # I_m
+        self.cryptogramm_I_n_id = None  # E(I_m, n)
+        self.M_1 = None  # M_1
+        self.signed_masked_iden_num = None
+        self.signed_iden_num = None  # I_s
+        self.codec = DecimalCodec  # кодирование больших чисел, согласуется при обмене ключами
+        self.message_key = None  # сеансовый ключ гибридного шифрования, согласуется при обмене ключами
+        self.send_sequence = 0  # номера следующих зашифрованных сообщений
+        self.recv_sequence = 0
+
+        # crypt keys
+        self.client_private_key = None
+        self.client_public_key = None
+        self.server_public_key = None
+        self.client_blind_private_key = None
+        self.client_blind_public_key = None
+        self.server_blind_public_key = None
+
+    async def connect(self) -> None:
+        reader, writer = await asyncio.open_connection(os.getenv("HOST"), int(os.getenv("PORT")))
+        self.stream = AsyncMessageStream(reader, writer,
+                                         max_frame=int(os.getenv("MAX_FRAME_LEN", MAX_FRAME_LEN)))
+        await self.stream.negotiate(os.getenv("FRAMING", FRAMING_RAW))
+
+    async def run(self) -> dict:
+        if self.stream is None:
+            await self.connect()
+        await self.generate_keys()
+        await self._stage("key_exchange", self.rsa_key_exchange())
+        await self._stage("blind_key_exchange", self.blind_rsa_key_exchange())
+        return {"REG": await self._stage("registration", self.registration_handler()),
+                "AUTH": await self._stage("authentication", self.authentication_handler()),
+                "BLIND_SIGN": await self._stage("blind_sign", self.blind_signature_handler())}
+
+    async def _stage(self, name: str, coro):
+        return await asyncio.wait_for(coro, self.stage_timeouts[name])
+
+    async def _crypto(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def newkeys(self, bits: int) -> tuple[rsa.PublicKey, rsa.PrivateKey]:
+        if self.key_pool is not None:
+            # пул ключей нельзя передать в другой процесс: выдача — в потоке цикла событий
+            return await asyncio.get_running_loop().run_in_executor(None, self.key_pool.get, bits)
+        return await self._crypto(rsa.newkeys, bits)
+
+    async def generate_keys(self) -> None:
+        (self.client_public_key, self.client_private_key), \
+            (self.client_blind_public_key, self.client_blind_private_key) = \
+            await asyncio.gather(self.newkeys(int(os.getenv("RSA_KEY_LEN"))),
+                                 self.newkeys(int(os.getenv("RSA_BLIND_KEY_LEN"))))
+
+    async def rsa_key_exchange(self) -> None:
+        send_data = {jk.REQUEST: jk.KEY_EXCHANGE,
+                     jk.KEYEX_CLIENT_PUB_N: str(self.client_public_key.n),
+                     jk.KEYEX_CLIENT_PUB_E: str(self.client_public_key.e)}
+        int_encoding = os.getenv("INT_ENCODING", INT_DECIMAL)
+        if int_encoding != INT_DECIMAL:
+            send_data[jk.INT_ENCODING] = int_encoding
+        if os.getenv("MESSAGE_ENCRYPTION", ENCRYPTION_FIELD) == ENCRYPTION_HYBRID:
+            send_data[jk.ENCRYPTION] = ENCRYPTION_HYBRID
+        # обмен ключами начинает сессию заново и никогда не шифруется прежним сеансовым ключом
+        self.set_message_key(None)
+        await self.send_json(send_data, encrypt=False)
+
+        recv_data = await self.recv_json()
+        self.codec = CODECS.get(recv_data.get(jk.INT_ENCODING), DecimalCodec)
+        if recv_data.get(jk.ENCRYPTION) == ENCRYPTION_HYBRID:
+            self.set_message_key(await self._crypto(unwrap_key, recv_data[jk.SESSION_KEY], self.client_private_key))
+        self.server_public_key = rsa.PublicKey(int(recv_data[jk.KEYEX_SERVER_PUB_N]),
+                                               int(recv_data[jk.KEYEX_SERVER_PUB_E]))
+
+    def set_message_key(self, key: bytes | None) -> None:
+        self.message_key = key
+        self.send_sequence = 0
+        self.recv_sequence = 0
+
+    async def blind_rsa_key_exchange(self) -> None:
+        await self.send_json({jk.REQUEST: jk.BLIND_KEY_EXCHANGE,
+                              jk.KEYEX_CLIENT_PUB_N: str(self.client_blind_public_key.n),
+                              jk.KEYEX_CLIENT_PUB_E: str(self.client_blind_public_key.e)})
+
+        recv_data = await self.recv_json()
+        self.server_blind_public_key = rsa.PublicKey(int(recv_data[jk.KEYEX_SERVER_PUB_N]),
+                                                     int(recv_data[jk.KEYEX_SERVER_PUB_E]))
+
+    async def registration_handler(self) -> bool:
+        await self.send_json(await self.json_encrypt({jk.REQUEST: jk.REGISTRATION,
+                                                      jk.FIRSTNAME: self.firstname,
+                                                      jk.LASTNAME: self.lastname,
+                                                      jk.PASSWORD: self.password}))
+        reg_data = await self.json_decrypt(await self.recv_json())
+        return reg_data[jk.REG_STATE] in ["Successful", "Voter exists"]
+
+    async def authentication_handler(self) -> bool:
+        await self.send_json(await self.json_encrypt({jk.REQUEST: jk.AUTENTICATION,
+                                                      jk.FIRSTNAME: self.firstname,
+                                                      jk.LASTNAME: self.lastname,
+                                                      jk.PASSWORD: self.password}))
+        auth_data = await self.json_decrypt(await self.recv_json())
+        return ast.literal_eval(auth_data[jk.AUTH_STATE])
+
+    async def blind_signature_handler(self):
+        server_n, server_e = self.server_public_key.n, self.server_public_key.e
+
+        await self.get_crypt_params()
+        self.iden_num = generate_iden_num(self.iden_num_len)
+        self.masking_factor = await self._crypto(gcd_and_simpl, server_n)
+        self.masked_iden_num = await self._crypto(mask, self.iden_num, self.masking_factor, server_e, server_n)
+        self.cryptogramm_I_n_id = await self._crypto(sign_crt,
+                                                     self.codec.pack_I_n_id(self.masked_iden_num, self.n_id),
+                                                     self.client_blind_private_key)
+
+        self.M_1 = [self.cryptogramm_I_n_id] + [self.n_id]
+        await self.send_json({jk.REQUEST: jk.BLIND_SIGN,
+                              jk.BLIND_MASK_IDEN_NUM: [self.codec.encode(self.cryptogramm_I_n_id,
+                                                                         int_width(self.client_blind_public_key.n)),
+                                                       self.n_id]})
+
+        response = (await self.recv_json())[jk.BLIND_SIGN_RESPONSE]
+        self.signed_masked_iden_num = response if response == jk.FAILED else self.codec.decode(response)
+
+        if self.signed_masked_iden_num != jk.FAILED:
+            self.signed_iden_num = demask(self.signed_masked_iden_num, self.masking_factor, server_n)
+            check = await self.check_iden_num()
+            await self.send_json({jk.REQUEST: jk.BLIND_SIGN_CONFIRM_REQUEST,
+                                  jk.BLIND_SIGN_CONFIRM: check})
+            return check
+        else:
+            await self.send_json({jk.BLIND_SIGN_CONFIRM: False})
+            return self.signed_masked_iden_num  # failed
+
+    async def check_iden_num(self) -> bool:
+        return self.iden_num == await self._crypto(unsign, self.signed_iden_num,
+                                                   self.server_public_key.e,
+                                                   self.server_public_key.n)
+
+    async def get_crypt_params(self) -> None:
+        await self.send_json({jk.REQUEST: jk.CRYPT_STAGE_1_INIT,
+                              jk.FIRSTNAME: self.firstname,
+                              jk.LASTNAME: self.lastname})
+        crypt_stage_1_data = await self.recv_json()
+
+        self.n_id = crypt_stage_1_data[jk.VOTER_ID]
+        self.iden_num_len = crypt_stage_1_data[jk.IDEN_NUM_LEN]
+
+    async def json_encrypt(self, json_data: dict[str: str]) -> dict[str: str]:
+        if self.message_key is not None:
+            return dict(json_data)  # сообщение шифруется целиком в send_json()
+        encrypt_dict = dict(json_data)
+        if jk.PASSWORD in json_data:
+            encrypt_dict[jk.PASSWORD] = await self._crypto(_encrypt_field, str(json_data[jk.PASSWORD]),
+                                                           self.server_public_key)
+        return encrypt_dict
+
+    async def json_decrypt(self, encrypt_json: dict[str: str]) -> dict[str: str]:
+        if self.message_key is not None:
+            return dict(encrypt_json)  # сообщение расшифровано целиком в recv_json()
+        json_data = dict(encrypt_json)
+        if jk.PASSWORD in encrypt_json:
+            json_data[jk.PASSWORD] = await self._crypto(_decrypt_field, encrypt_json[jk.PASSWORD],
+                                                        self.client_private_key)
+        return json_data
+
+    async def send_json(self, message: dict[str: str], encrypt: bool = True) -> None:
+        if encrypt and self.message_key is not None:
+            message = seal(self.message_key, message, CLIENT_TO_SERVER, self.send_sequence)
+            self.send_sequence += 1
+        await self.stream.send_json(message)
+
+    async def recv_json(self) -> dict:
+        message = await self.stream.recv_json()
+        if jk.ENCRYPTED in message:
+            message = unseal(self.message_key, message, SERVER_TO_CLIENT, self.recv_sequence)
+            self.recv_sequence += 1
+        return message
+
+    async def close(self) -> None:
+        if self.stream is not None:
+            await self.stream.close()
+            self.stream = None
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+
+async def run_sessions(voters: list[tuple[str, str, str]], concurrency: int = 1000, **client_kwargs) -> list:
+    """Запускает сессии голосования для списка избирателей на текущем цикле событий.
+
+    :param list voters: список ``(firstname, lastname, password)``.
+    :param int concurrency: максимальное число одновременных сессий.
+    :return: результаты :py:meth:`AsyncREVClient.run` или исключения, в порядке ``voters``.
+    :rtype: list
+    """
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def session(firstname: str, lastname: str, password: str):
+        async with semaphore:
+            async with AsyncREVClient(firstname, lastname, password, **client_kwargs) as client:
+                return await client.run()
+
+    return await asyncio.gather(*(session(*voter) for voter in voters), return_exceptions=True)
@@ -0,0 +1,755 @@
+import argparse
+import base64
+import copy
+import inspect
+import json
+import math
+import os
+import platform
+import random
+import socket
+import string
+import subprocess
+import sys
+import threading
+import time
+
+from framing import MessageStream, FRAMING_LENGTH, FRAMING_LINE
+from instrumentation import Instrumentation, HistogramSink, NULL_INSTRUMENTATION
+from json_keys import JsonKeys as jk
+from rev_crypt import gcd_and_simpl, gcd_and_simpl_batch, sign, sign_list, sign_crt, sign_list_crt, \
+    pack_I_n_id, unpack_I_n_id, pack_I_n_id_bits, unpack_I_n_id_bits, mask, demask, unsign, unsign_list, \
+    unsign_check_batch, generate_iden_num, generate_iden_num_batch, mask_batch, demask_batch, mask_factors, inverse_batch
+from wire_codec import CODECS, int_width
+
+KEY_LENS = (512, 1024, 2048, 4096)
+BATCH_SIZES = (1, 10, 100, 1000, 10000)
+SEED = 0
+IDEN_NUM_LEN = 100
+THRESHOLD = 0.1
+
+# произведение нечётных простых до 2000: быстрый отсев кандидатов перед тестом Миллера — Рабина
+_SMALL_PRIMES = math.prod(p for p in range(3, 2000, 2) if all(p % q for q in range(3, math.isqrt(p) + 1, 2)))
+
+_private_keys = {}
+
+BENCHMARKS = {}
+
+
+def benchmark(name: str):
+    """Регистрирует функцию бенчмарка под именем ``name``."""
+
+    def decorator(func):
+        BENCHMARKS[name] = func
+        return func
+    return decorator
+
+
+def measure(func, repeat: int, items: int = 1) -> dict:
+    """Выполняет ``func`` ``repeat`` раз и возвращает статистику времени в секундах.
+    ``per_item`` — медиана, делённая на число элементов ``items``, обработанных за вызов."""
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return {"repeat": repeat,
+            "min": times[0],
+            "median": times[len(times) // 2],
+            "mean": sum(times) / repeat,
+            "per_item": times[len(times) // 2] / items}
+
+
+def random_int(bits: int) -> int:
+    return random.getrandbits(bits) | (1 << (bits - 1))
+
+
+def _seeded_prime(rng: random.Random, bits: int) -> int:
+    from rsa.prime import is_prime
+
+    while True:
+        # два старших бита: произведение двух таких чисел имеет ровно сумму длин
+        candidate = rng.getrandbits(bits) | (3 << (bits - 2)) | 1
+        if math.gcd(candidate, _SMALL_PRIMES) == 1 and is_prime(candidate):
+            return candidate
+
+
+def private_key(bits: int):
+    """Закрытый ключ RSA заданной длины; генерируется один раз за запуск
+    из фиксированного зерна, поэтому одинаков во всех запусках."""
+
+    if bits not in _private_keys:
+        import rsa
+        rng = random.Random(f"{SEED}:{bits}")
+        e = 65537
+        while True:
+            p, q = _seeded_prime(rng, bits - bits // 2), _seeded_prime(rng, bits // 2)
+            phi = (p - 1) * (q - 1)
+            if p != q and math.gcd(e, phi) == 1:
+                break
+        _private_keys[bits] = rsa.PrivateKey(p * q, e, pow(e, -1, phi), p, q)
+    return _private_keys[bits]
+
+
+def _coprime_factors(n: int, count: int) -> list[int]:
+    """Маскирующие множители из генератора ``random`` (с фиксированным зерном),
+    а не из CSPRNG, чтобы входные данные совпадали между запусками."""
+
+    factors = []
+    while len(factors) < count:
+        factor = random.randrange(2, n)
+        if math.gcd(factor, n) == 1:
+            factors.append(factor)
+    return factors
+
+
+def _batch_repeat(repeat: int, batch: int) -> int:
+    # большие пакеты измеряются реже, чтобы полный прогон укладывался в разумное время
+    return max(1, min(repeat, repeat * 10 // batch))
+
+
+def _legacy_send(sock: socket.socket, message: dict) -> None:
+    sock.send(json.dumps(message).encode())
+
+
+def _legacy_recv(sock: socket.socket) -> dict:
+    return json.loads(sock.recv(16384).decode())
+
+
+def _ping_pong(send, recv, message: dict, count: int):
+    def run():
+        for _ in range(count):
+            send(message)
+            recv()
+    return run
+
+
+@benchmark("framing")
+def bench_framing(key_lens=KEY_LENS, repeat: int = 20, count: int = 200) -> dict:
+    """Обмен сообщениями ``M_1`` через пару сокетов: ``send``/``recv(16384)``
+    против :py:class:`framing.MessageStream`."""
+
+    results = {}
+    for bits in key_lens:
+        message = {jk.REQUEST: jk.BLIND_SIGN,
+                   jk.BLIND_MASK_IDEN_NUM: [random_int(bits), random.getrandbits(32)]}
+        modes = {"legacy": None, FRAMING_LENGTH: FRAMING_LENGTH, FRAMING_LINE: FRAMING_LINE}
+        results[bits] = {}
+        for name, mode in modes.items():
+            client, server = socket.socketpair()
+            if mode is None:
+                send, recv = (lambda m: _legacy_send(client, m)), (lambda: _legacy_recv(client))
+                echo_send, echo_recv = (lambda m: _legacy_send(server, m)), (lambda: _legacy_recv(server))
+            else:
+                client_stream, server_stream = MessageStream(client, mode), MessageStream(server, mode)
+                send, recv = client_stream.send_json, client_stream.recv_json
+                echo_send, echo_recv = server_stream.send_json, server_stream.recv_json
+
+            def echo():
+                while True:
+                    data = echo_recv()
+                    if data.get(jk.REQUEST) is None:
+                        return
+                    echo_send(data)
+
+            thread = threading.Thread(target=echo, daemon=True)
+            thread.start()
+            results[bits][name] = measure(_ping_pong(send, recv, message, count), repeat)
+            send({jk.REQUEST: None})
+            thread.join()
+            client.close()
+            server.close()
+    return results
+
+
+def _randprime_factor(n: int) -> int:
+    from sympy import randprime
+    return randprime(1, n)
+
+
+def _has_sympy() -> bool:
+    try:
+        import sympy  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+@benchmark("masking_factor")
+def bench_masking_factor(key_lens=KEY_LENS, repeat: int = 20, count: int = 100) -> dict:
+    """Генерация ``count`` маскирующих множителей: ``sympy.randprime`` (прежняя
+    реализация), :py:func:`rev_crypt.gcd_and_simpl` и
+    :py:func:`rev_crypt.gcd_and_simpl_batch`."""
+
+    results = {}
+    for bits in key_lens:
+        n = random_int(bits) | 1
+        # randprime на больших модулях работает секунды, поэтому для него берётся малая выборка
+        legacy_count = max(count // 50, 1)
+        results[bits] = {
+            "gcd_and_simpl": measure(lambda: [gcd_and_simpl(n) for _ in range(count)], repeat, count),
+            "gcd_and_simpl_batch": measure(lambda: gcd_and_simpl_batch(n, count), repeat, count),
+        }
+        if _has_sympy():
+            results[bits]["randprime"] = measure(lambda: [_randprime_factor(n) for _ in range(legacy_count)],
+                                                 1, legacy_count)
+    return results
+
+
+@benchmark("sign")
+def bench_sign(key_lens=KEY_LENS, repeat: int = 20, count: int = 50) -> dict:
+    """Подпись ``count`` сообщений: ``pow(m, d, n)`` против CRT
+    (с маскированием и без) и пакетная подпись списком."""
+
+    results = {}
+    for bits in key_lens:
+        key = private_key(bits)
+        messages = [random.randrange(2, key.n) for _ in range(count)]
+        results[bits] = {
+            "sign": measure(lambda: [sign(m, key.d, key.n) for m in messages], repeat, count),
+            "sign_crt": measure(lambda: [sign_crt(m, key) for m in messages], repeat, count),
+            "sign_crt_blinding": measure(lambda: [sign_crt(m, key, blinding=True) for m in messages],
+                                         repeat, count),
+            "sign_list": measure(lambda: sign_list(messages, key.d, key.n), repeat, count),
+            "sign_list_crt": measure(lambda: sign_list_crt(messages, key), repeat, count),
+        }
+        results[bits]["speedup"] = results[bits]["sign"]["per_item"] / results[bits]["sign_crt"]["per_item"]
+    return results
+
+
+def _pack_I_n_id_str(I: int, n_id: int) -> int:
+    return int(str(I) + ("0" * 20 + str(n_id))[-20:])
+
+
+def _unpack_I_n_id_str(E_I_n_id: int) -> tuple[int, int]:
+    return int(str(E_I_n_id)[:-20]), int(str(E_I_n_id)[-20:])
+
+
+@benchmark("wire_codec")
+def bench_wire_codec(key_lens=KEY_LENS, repeat: int = 20, count: int = 100) -> dict:
+    """Кодирование сообщения ``M_1`` в JSON и обратно для каждого кодирования
+    целых чисел (время и размер сообщения), а также упаковка ``I`` и ``n_id``:
+    строковая (прежняя), десятичная арифметическая и двоичная."""
+
+    results = {}
+    for bits in key_lens:
+        n = random_int(bits)
+        width = int_width(n)
+        values = [random.randrange(n) for _ in range(count)]
+        results[bits] = {}
+        for name, codec in CODECS.items():
+            def round_trip():
+                for value in values:
+                    message = json.dumps({jk.BLIND_MASK_IDEN_NUM: [codec.encode(value, width), 15]})
+                    codec.decode(json.loads(message)[jk.BLIND_MASK_IDEN_NUM][0])
+            results[bits][name] = measure(round_trip, repeat, count)
+            results[bits][name]["bytes"] = len(json.dumps({jk.BLIND_MASK_IDEN_NUM: [codec.encode(values[0], width),
+                                                                                     15]}))
+        packs = {"pack_str": (_pack_I_n_id_str, _unpack_I_n_id_str),
+                 "pack_decimal": (pack_I_n_id, unpack_I_n_id),
+                 "pack_bits": (pack_I_n_id_bits, unpack_I_n_id_bits)}
+        for name, (pack, unpack) in packs.items():
+            results[bits][name] = measure(lambda: [unpack(pack(value, 15)) for value in values], repeat, count)
+    return results
+
+
+@benchmark("instrumentation")
+def bench_instrumentation(key_lens=KEY_LENS, repeat: int = 20, count: int = 10000) -> dict:
+    """Накладные расходы на измерение одного этапа: без измерений,
+    с отключёнными (:py:data:`instrumentation.NULL_INSTRUMENTATION`)
+    и с включёнными измерениями в память."""
+
+    enabled = Instrumentation(HistogramSink())
+
+    def bare():
+        for _ in range(count):
+            pass
+
+    def staged(instrumentation):
+        def run():
+            for _ in range(count):
+                with instrumentation.stage("stage"):
+                    pass
+        return run
+
+    return {"bare": measure(bare, repeat, count),
+            "disabled": measure(staged(NULL_INSTRUMENTATION), repeat, count),
+            "enabled": measure(staged(enabled), repeat, count)}
+
+
+@benchmark("rev_crypt")
+def bench_rev_crypt(key_lens=KEY_LENS, repeat: int = 20, batch_sizes=BATCH_SIZES) -> dict:
+    """Примитивы :py:mod:`rev_crypt` на пакетах из ``batch_sizes`` элементов
+    для каждой длины ключа. Входные данные и ключи детерминированы."""
+
+    results = {}
+    for bits in key_lens:
+        key = private_key(bits)
+        n, e, d = key.n, key.e, key.d
+        size = max(batch_sizes)
+        values = [random.randrange(2, n) for _ in range(size)]
+        factors = _coprime_factors(n, size)
+        # I_m с n_id должно помещаться в ключ той же длины
+        packed_values = [value >> 80 for value in values]
+        n_id = 15
+        results[bits] = {}
+        for batch in batch_sizes:
+            batch_values, batch_factors, batch_packed = values[:batch], factors[:batch], packed_values[:batch]
+            packed = [pack_I_n_id(value, n_id) for value in batch_packed]
+            primitives = {
+                "generate_iden_num": lambda: [generate_iden_num(IDEN_NUM_LEN) for _ in range(batch)],
+                "generate_iden_num_batch": lambda: generate_iden_num_batch(IDEN_NUM_LEN, batch),
+                "gcd_and_simpl": lambda: [gcd_and_simpl(n) for _ in range(batch)],
+                "gcd_and_simpl_batch": lambda: gcd_and_simpl_batch(n, batch),
+                "mask": lambda: [mask(value, factor, e, n) for value, factor in zip(batch_values, batch_factors)],
+                "demask": lambda: [demask(value, factor, n) for value, factor in zip(batch_values, batch_factors)],
+                "sign": lambda: [sign(value, d, n) for value in batch_values],
+                "sign_crt": lambda: sign_list_crt(batch_values, key),
+                "unsign": lambda: unsign_list(batch_values, e, n),
+                "pack_I_n_id": lambda: [pack_I_n_id(value, n_id) for value in batch_packed],
+                "unpack_I_n_id": lambda: [unpack_I_n_id(value) for value in packed],
+            }
+            results[bits][batch] = {name: measure(func, _batch_repeat(repeat, batch), batch)
+                                    for name, func in primitives.items()}
+    return results
+
+
+IDEN_NUM_LENS = (100, 300, 1000)
+# критическое значение хи-квадрат для 9 степеней свободы при уровне значимости 0.001
+CHI2_CRITICAL_9 = 27.877
+
+
+def _generate_iden_num_legacy(l: int) -> int:
+    return int(''.join(random.choice(string.digits) for _ in range(l)))
+
+
+def chi_square_digits(iden_nums: list[int], l: int) -> dict:
+    """Проверка равномерности по критерию хи-квадрат: частоты цифр (с ведущими
+    нулями до длины ``l``) во всех позициях и отдельно в старшей позиции
+    сравниваются с равномерным распределением.
+
+    :return: статистики ``all_digits`` и ``leading_digit`` и признак ``uniform``
+        (обе меньше критического значения при уровне значимости 0.001).
+    :rtype: dict
+
+    :example:
+    >>> chi_square_digits([int("0123456789" * 10)] * 10, 100)["all_digits"]
+    0.0
+    """
+
+    def chi_square(counts: list[int]) -> float:
+        expected = sum(counts) / len(counts)
+        return sum((count - expected) ** 2 / expected for count in counts)
+
+    all_digits = [0] * 10
+    leading = [0] * 10
+    for iden_num in iden_nums:
+        digits = str(iden_num).zfill(l)
+        for digit in range(10):
+            all_digits[digit] += digits.count(str(digit))
+        leading[int(digits[0])] += 1
+    statistics = {"all_digits": chi_square(all_digits), "leading_digit": chi_square(leading)}
+    statistics["uniform"] = all(value < CHI2_CRITICAL_9 for value in statistics.values())
+    return statistics
+
+
+@benchmark("iden_num")
+def bench_iden_num(key_lens=KEY_LENS, repeat: int = 20, count: int = 1000) -> dict:
+    """Генерация ``count`` идентификационных номеров разной длины: посимвольно
+    через ``random.choice`` (прежняя реализация), :py:func:`rev_crypt.generate_iden_num`
+    и :py:func:`rev_crypt.generate_iden_num_batch`, с проверкой равномерности
+    (:py:func:`chi_square_digits`) для каждого варианта."""
+
+    variants = {"legacy": lambda l: [_generate_iden_num_legacy(l) for _ in range(count)],
+                "generate_iden_num": lambda l: [generate_iden_num(l) for _ in range(count)],
+                "generate_iden_num_batch": lambda l: generate_iden_num_batch(l, count)}
+    results = {}
+    for l in IDEN_NUM_LENS:
+        results[l] = {}
+        for name, generate in variants.items():
+            results[l][name] = measure(lambda: generate(l), max(repeat // 4, 1), count)
+            results[l][name]["uniformity"] = chi_square_digits(generate(l), l)
+    return results
+
+
+def _mask_legacy(int_msg: int, masking_factor: int, e: int, n: int) -> int:
+    return pow(copy.deepcopy(int_msg) * pow(masking_factor, e, n), 1, n)
+
+
+def _demask_legacy(int_msg: int, masking_factor: int, n: int) -> int:
+    return pow(copy.deepcopy(int_msg) * pow(masking_factor, -1, n), 1, n)
+
+
+@benchmark("masking")
+def bench_masking(key_lens=KEY_LENS, repeat: int = 20, batch_sizes=BATCH_SIZES) -> dict:
+    """Маскирование и демаскирование пакета: прежние функции (``deepcopy`` и
+    ``pow(x, 1, n)``), текущие :py:func:`rev_crypt.mask`/:py:func:`rev_crypt.demask`
+    и пакетные :py:func:`rev_crypt.mask_batch`/:py:func:`rev_crypt.demask_batch`,
+    а также обращение множителей по одному и методом Монтгомери.
+    Результаты всех вариантов сверяются."""
+
+    results = {}
+    for bits in key_lens:
+        key = private_key(bits)
+        n, e = key.n, key.e
+        size = max(batch_sizes)
+        values = [random.randrange(2, n) for _ in range(size)]
+        factors = _coprime_factors(n, size)
+        results[bits] = {}
+        for batch in batch_sizes:
+            batch_values, batch_factors = values[:batch], factors[:batch]
+            masked = mask_batch(batch_values, batch_factors, e, n)
+            demasked = demask_batch(batch_values, batch_factors, n)
+            if masked != [_mask_legacy(v, f, e, n) for v, f in zip(batch_values, batch_factors)] \
+                    or demasked != [_demask_legacy(v, f, n) for v, f in zip(batch_values, batch_factors)]:
+                raise AssertionError("batch masking differs from scalar masking")
+            masked_factors, inverses = mask_factors(batch_factors, e, n), inverse_batch(batch_factors, n)
+            variants = {
+                "mask_legacy": lambda: [_mask_legacy(v, f, e, n) for v, f in zip(batch_values, batch_factors)],
+                "mask": lambda: [mask(v, f, e, n) for v, f in zip(batch_values, batch_factors)],
+                "mask_batch": lambda: mask_batch(batch_values, batch_factors, e, n),
+                "mask_batch_precomputed": lambda: mask_batch(batch_values, batch_factors, e, n, masked_factors),
+                "demask_legacy": lambda: [_demask_legacy(v, f, n) for v, f in zip(batch_values, batch_factors)],
+                "demask": lambda: [demask(v, f, n) for v, f in zip(batch_values, batch_factors)],
+                "demask_batch": lambda: demask_batch(batch_values, batch_factors, n),
+                "demask_batch_precomputed": lambda: demask_batch(batch_values, batch_factors, n, inverses),
+                "inverse": lambda: [pow(f, -1, n) for f in batch_factors],
+                "inverse_batch": lambda: inverse_batch(batch_factors, n),
+            }
+            results[bits][batch] = {name: measure(func, _batch_repeat(repeat, batch), batch)
+                                    for name, func in variants.items()}
+    return results
+
+
+def _round_trip(server_key, client_blind_key, items: list[tuple[int, int]], n_id: int) -> None:
+    """Слепая подпись каждого идентификационного номера: маскирование и
+    подпись ``M_1`` клиентом, проверка и подпись сервером, демаскирование
+    и проверка подписи клиентом."""
+
+    for iden_num, factor in items:
+        masked = mask(iden_num, factor, server_key.e, server_key.n)
+        M_1 = sign_crt(pack_I_n_id(masked, n_id), client_blind_key)
+        # сервер
+        masked_, n_id_ = unpack_I_n_id(unsign(M_1, client_blind_key.e, client_blind_key.n))
+        if n_id_ != n_id:
+            raise AssertionError("n_id mismatch")
+        signed_masked = sign_crt(masked_, server_key)
+        # клиент
+        signed = demask(signed_masked, factor, server_key.n)
+        if unsign(signed, server_key.e, server_key.n) != iden_num:
+            raise AssertionError("blind signature check failed")
+
+
+def _round_trip_batch(server_key, client_blind_key, items: list[tuple[int, int]], n_id: int) -> None:
+    """То же, что :py:func:`_round_trip`, но пакетом: подпись списком и
+    пакетная проверка :py:func:`rev_crypt.unsign_check_batch`."""
+
+    iden_nums = [iden_num for iden_num, _ in items]
+    M_1 = sign_list_crt([pack_I_n_id(mask(iden_num, factor, server_key.e, server_key.n), n_id)
+                         for iden_num, factor in items], client_blind_key)
+    # сервер
+    unpacked = [unpack_I_n_id(packed) for packed in unsign_list(M_1, client_blind_key.e, client_blind_key.n)]
+    if any(n_id_ != n_id for _, n_id_ in unpacked):
+        raise AssertionError("n_id mismatch")
+    signed_masked = sign_list_crt([masked for masked, _ in unpacked], server_key)
+    # клиент
+    signed = [demask(value, factor, server_key.n) for value, (_, factor) in zip(signed_masked, items)]
+    if not unsign_check_batch(signed, iden_nums, server_key.e, server_key.n):
+        raise AssertionError("blind signature check failed")
+
+
+@benchmark("blind_sign")
+def bench_blind_sign(key_lens=KEY_LENS, repeat: int = 20, batch_sizes=BATCH_SIZES) -> dict:
+    """Полный цикл слепой подписи в одном процессе, без сети: ключ сервера
+    длины ``bits``, «слепой» ключ клиента на 128 битов длиннее, чтобы
+    вместить упакованные ``I_m`` и ``n_id``."""
+
+    results = {}
+    for bits in key_lens:
+        server_key, client_blind_key = private_key(bits), private_key(bits + 128)
+        size = max(batch_sizes)
+        # номера из генератора с фиксированным зерном, а не из CSPRNG generate_iden_num
+        items = list(zip((random.randrange(10 ** IDEN_NUM_LEN) % server_key.n for _ in range(size)),
+                         _coprime_factors(server_key.n, size)))
+        results[bits] = {}
+        for batch in batch_sizes:
+            batch_items = items[:batch]
+            results[bits][batch] = {
+                "round_trip": measure(lambda: _round_trip(server_key, client_blind_key, batch_items, 15),
+                                      _batch_repeat(repeat, batch), batch),
+                "round_trip_batch": measure(lambda: _round_trip_batch(server_key, client_blind_key, batch_items, 15),
+                                            _batch_repeat(repeat, batch), batch),
+            }
+    return results
+
+
+@benchmark("crypto_executor")
+def bench_crypto_executor(key_lens=KEY_LENS, repeat: int = 20, count: int = 20) -> dict:
+    """Подпись ``count`` сообщений через :py:class:`crypto_executor.CryptoExecutor`
+    каждого типа, пока фоновый поток отмечает интервалы по 1 мс: ``max_stall`` —
+    наибольшая задержка этого потока, т. е. насколько криптография мешает
+    другим сессиям и интерфейсу в том же процессе."""
+
+    from crypto_executor import CryptoExecutor, CRYPTO_BACKENDS
+
+    results = {}
+    for bits in key_lens:
+        key = private_key(bits)
+        messages = [random.randrange(2, key.n) for _ in range(count)]
+        results[bits] = {}
+        for backend in CRYPTO_BACKENDS:
+            with CryptoExecutor(backend) as executor:
+                executor.run(sign_crt, messages[0], key)  # запуск пула вне измерения
+                stalls = []
+                stop = threading.Event()
+
+                def heartbeat():
+                    last = time.perf_counter()
+                    while not stop.wait(0.001):
+                        now = time.perf_counter()
+                        stalls.append(now - last)
+                        last = now
+
+                thread = threading.Thread(target=heartbeat, daemon=True)
+                thread.start()
+                results[bits][backend] = measure(lambda: [executor.run(sign_crt, m, key) for m in messages],
+                                                 max(repeat // 4, 1), count)
+                stop.set()
+                thread.join()
+                results[bits][backend]["max_stall"] = max(stalls, default=0.0)
+    return results
+
+
+@benchmark("precompute")
+def bench_precompute(key_lens=KEY_LENS, repeat: int = 20, batch_sizes=BATCH_SIZES) -> dict:
+    """Получение наборов для слепой подписи из :py:class:`precompute.PrecomputeStore`:
+    из заполненного запаса, из запаса для другой длины номера (повторное
+    использование множителей) и построение на месте."""
+
+    from precompute import PrecomputeStore
+
+    results = {}
+    for bits in key_lens:
+        key = private_key(bits)
+        results[bits] = {}
+        for batch in batch_sizes:
+            def filled(iden_num_len):
+                store = PrecomputeStore(key.e, key.n, iden_num_len, size=batch)
+                store.start()._thread.join()
+                return store
+
+            variants = {"ready": IDEN_NUM_LEN, "reused": IDEN_NUM_LEN // 2, "on_demand": None}
+            results[bits][batch] = {}
+            for name, iden_num_len in variants.items():
+                count = _batch_repeat(repeat, batch)
+                stores = [filled(iden_num_len) if iden_num_len else PrecomputeStore(key.e, key.n, IDEN_NUM_LEN, 0)
+                          for _ in range(count)]
+                results[bits][batch][name] = measure(lambda: stores.pop().take(batch, IDEN_NUM_LEN), count, batch)
+    return results
+
+
+def _field_encrypt(message: dict, public_key) -> str:
+    import rsa
+
+    encrypted = dict(message)
+    encrypted[jk.PASSWORD] = base64.b64encode(rsa.encrypt(message[jk.PASSWORD].encode(), public_key)).decode()
+    return json.dumps(encrypted)
+
+
+def _field_decrypt(data: str, private_key) -> dict:
+    import rsa
+
+    message = json.loads(data)
+    message[jk.PASSWORD] = rsa.decrypt(base64.b64decode(message[jk.PASSWORD]), private_key).decode()
+    return message
+
+
+@benchmark("envelope")
+def bench_envelope(key_lens=KEY_LENS, repeat: int = 20, count: int = 50) -> dict:
+    """Задержка на сообщение: прежнее шифрование поля пароля RSA
+    (``field``) против гибридного режима (:py:mod:`envelope`), в котором
+    сообщение шифруется целиком. ``*_client`` — только сторона клиента,
+    ``*_round_trip`` — шифрование и расшифровка. ``hybrid_m1`` — сообщение
+    ``M_1``, которое прежде не шифровалось; ``wrap_key`` — однократная
+    передача сеансового ключа."""
+
+    import rsa
+    import sym_crypt
+    from envelope import CLIENT_TO_SERVER, wrap_key, unwrap_key, seal, unseal
+
+    results = {}
+    for bits in key_lens:
+        key = private_key(bits)
+        public_key = rsa.PublicKey(key.n, key.e)
+        session_key = sym_crypt.generate_key()
+        message = {jk.REQUEST: jk.REGISTRATION, jk.FIRSTNAME: "firstname", jk.LASTNAME: "lastname",
+                   jk.PASSWORD: "password"}
+        m_1 = {jk.REQUEST: jk.BLIND_SIGN, jk.BLIND_MASK_IDEN_NUM: [random.randrange(key.n), 15]}
+
+        def hybrid_client(msg):
+            return lambda: [json.dumps(seal(session_key, msg, CLIENT_TO_SERVER, i)) for i in range(count)]
+
+        def hybrid_round_trip(msg):
+            return lambda: [unseal(session_key, json.loads(json.dumps(seal(session_key, msg, CLIENT_TO_SERVER, i))),
+                                   CLIENT_TO_SERVER, i) for i in range(count)]
+
+        results[bits] = {
+            "field_client": measure(lambda: [_field_encrypt(message, public_key) for _ in range(count)],
+                                    repeat, count),
+            "field_round_trip": measure(lambda: [_field_decrypt(_field_encrypt(message, public_key), key)
+                                                 for _ in range(count)], max(repeat // 4, 1), count),
+            "hybrid_client": measure(hybrid_client(message), repeat, count),
+            "hybrid_round_trip": measure(hybrid_round_trip(message), repeat, count),
+            "hybrid_m1_round_trip": measure(hybrid_round_trip(m_1), repeat, count),
+            "wrap_key": measure(lambda: unwrap_key(wrap_key(session_key, public_key), key), max(repeat // 4, 1)),
+        }
+    return results
+
+
+IMPORT_MODULES = ("Client", "async_client", "rev_crypt")
+
+
+def import_time(module: str) -> dict:
+    """Время холодного импорта модуля по данным ``python -X importtime``
+    в отдельном процессе.
+
+    :param str module: имя импортируемого модуля.
+    :return: суммарное время импорта (мкс), число загруженных модулей
+        и признаки загрузки sympy и dotenv.
+    :rtype: dict
+
+    :example:
+    >>> result = import_time("Client")  # sympy и dotenv загружаются только при необходимости
+    >>> result["sympy"], result["dotenv"]
+    (False, False)
+    """
+
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                             capture_output=True, text=True, check=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)))
+    cumulative = 0
+    modules = []
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        modules.append(name)
+        if name == module:
+            cumulative = int(cumulative_us)
+    return {"cumulative_us": cumulative,
+            "modules": len(modules),
+            "sympy": any(name == "sympy" or name.startswith("sympy.") for name in modules),
+            "dotenv": any(name == "dotenv" or name.startswith("dotenv.") for name in modules)}
+
+
+@benchmark("import_time")
+def bench_import_time(key_lens=KEY_LENS, repeat: int = 5) -> dict:
+    """Время холодного импорта клиентских модулей (минимум из ``repeat`` запусков)."""
+
+    results = {}
+    for module in IMPORT_MODULES:
+        runs = [import_time(module) for _ in range(repeat)]
+        results[module] = min(runs, key=lambda run: run["cumulative_us"])
+    return results
+
+
+def compare(baseline: dict, current: dict, threshold: float = THRESHOLD, metric: str = "median") -> dict:
+    """Сравнение результатов с базовыми: замер считается регрессией, если
+    ``metric`` вырос более чем на долю ``threshold``.
+
+    :param dict baseline: базовые результаты (сохранённые ``--save``).
+    :param dict current: текущие результаты.
+    :param float threshold: допустимое относительное замедление.
+    :param str metric: сравниваемая величина из :py:func:`measure`.
+    :return: число сравнённых замеров, регрессии и ускорения.
+    :rtype: dict
+
+    :example:
+    >>> base = {"results": {"sign": {"512": {"sign": {"median": 1.0}}}}}
+    >>> compare(base, {"results": {"sign": {"512": {"sign": {"median": 1.5}}}}})["regressions"]
+    [{'benchmark': 'sign/512/sign', 'baseline': 1.0, 'current': 1.5, 'change': 0.5}]
+    """
+
+    report = {"compared": 0, "regressions": [], "improvements": []}
+
+    def walk(base: dict, cur: dict, path: list[str]) -> None:
+        if metric in base and metric in cur:
+            report["compared"] += 1
+            change = cur[metric] / base[metric] - 1 if base[metric] else 0.0
+            entry = {"benchmark": "/".join(path), "baseline": base[metric], "current": cur[metric], "change": change}
+            if change > threshold:
+                report["regressions"].append(entry)
+            elif change < -threshold:
+                report["improvements"].append(entry)
+            return
+        for key, value in base.items():
+            if isinstance(value, dict) and isinstance(cur.get(key), dict):
+                walk(value, cur[key], path + [key])
+
+    walk(baseline.get("results", baseline), current.get("results", current), [])
+    return report
+
+
+def _load(path: str) -> dict:
+    with open(path) as file:
+        return json.load(file)
+
+
+def compare_main(argv: list[str]) -> dict:
+    parser = argparse.ArgumentParser(prog="benchmarks.py compare",
+                                     description="compare benchmark results against a baseline")
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="relative slowdown reported as a regression")
+    parser.add_argument("--metric", choices=("min", "median", "mean", "per_item"), default="median")
+    args = parser.parse_args(argv)
+
+    report = compare(_load(args.baseline), _load(args.current), args.threshold, args.metric)
+    print(json.dumps(report, indent=2))
+    if report["regressions"]:
+        sys.exit(1)
+    return report
+
+
+def main(argv=None) -> dict:
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["compare"]:
+        return compare_main(argv[1:])
+
+    parser = argparse.ArgumentParser(description="REV client benchmarks; "
+                                                 "'compare BASELINE CURRENT' checks for regressions")
+    parser.add_argument("names", nargs="*", help=f"benchmarks to run: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--key-lens", type=int, nargs="+", default=list(KEY_LENS))
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=list(BATCH_SIZES))
+    parser.add_argument("--seed", type=int, default=SEED, help="seed for benchmark inputs")
+    parser.add_argument("--save", help="write results with run metadata to this JSON baseline file")
+    args = parser.parse_args(argv)
+
+    options = {"key_lens": args.key_lens, "repeat": args.repeat, "batch_sizes": args.batch_sizes}
+    results = {}
+    for name in args.names or BENCHMARKS:
+        func = BENCHMARKS[name]
+        parameters = inspect.signature(func).parameters
+        random.seed(args.seed)
+        results[name] = func(**{key: value for key, value in options.items() if key in parameters})
+    output = json.dumps(results, indent=2)
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump({"meta": {"seed": args.seed,
+                                "repeat": args.repeat,
+                                "key_lens": args.key_lens,
+                                "batch_sizes": args.batch_sizes,
+                                "python": platform.python_version(),
+                                "platform": platform.platform(),
+                                "time": time.time()},
+                       "results": results}, file, indent=2)
+    print(output)
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,452 @@
+import itertools
+import os
+import queue
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+from framing import MessageStream, FRAMING_RAW, MAX_FRAME_LEN
+from json_keys import JsonKeys as jk
+from settings import load_env
+
+
+def is_alive(sock: socket.socket) -> bool:
+    """Проверка простаивающего соединения без блокировки: сокет открыт,
+    сервер не закрыл соединение и не прислал непрошеных данных.
+
+    :param socket.socket sock: проверяемый сокет.
+    :rtype: bool
+    """
+
+    if sock.fileno() == -1:
+        return False
+    timeout = sock.gettimeout()
+    sock.setblocking(False)
+    try:
+        # b"" — соединение закрыто сервером; данные без запроса — состояние протокола неизвестно
+        return not sock.recv(1, socket.MSG_PEEK)
+    except (BlockingIOError, InterruptedError):
+        return True
+    except OSError:
+        return False
+    finally:
+        sock.settimeout(timeout)
+
+
+class MuxChannel:
+    """Сессия избирателя внутри мультиплексированного соединения. Имеет тот же
+    интерфейс, что и :py:class:`framing.MessageStream`: исходящие сообщения
+    помечаются идентификатором сессии, ответы доставляет поток чтения
+    :py:class:`MultiplexedConnection`.
+
+    :param MultiplexedConnection connection: общее соединение.
+    :param int session_id: идентификатор сессии.
+    :param float timeout: время ожидания ответа в секундах.
+    """
+
+    def __init__(self, connection: "MultiplexedConnection", session_id: int, timeout: float):
+        self.connection = connection
+        self.session_id = session_id
+        self.timeout = timeout
+        self.last_frame_len = 0
+        self._responses = queue.SimpleQueue()
+
+    @property
+    def socket(self) -> socket.socket:
+        return self.connection.stream.socket
+
+    def deliver(self, message: dict | None, frame_len: int) -> None:
+        self._responses.put((message, frame_len))
+
+    def send_json(self, message: dict) -> int:
+        return self.connection.send({**message, jk.SESSION_ID: self.session_id})
+
+    def recv_json(self) -> dict:
+        try:
+            message, self.last_frame_len = self._responses.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError(f"no response for session {self.session_id}") from None
+        if message is None:
+            raise ConnectionError("multiplexed connection closed")
+        return message
+
+    def close(self) -> None:
+        self.connection.close_channel(self.session_id)
+
+
+class MultiplexedConnection:
+    """Одно соединение с сервером, разделяемое несколькими сессиями. Каждое
+    сообщение несёт :py:attr:`JsonKeys.SESSION_ID`; фоновый поток читает
+    ответы и передаёт их соответствующему :py:class:`MuxChannel`.
+
+    :param MessageStream stream: подключённый поток сообщений.
+    :param float timeout: время ожидания ответа сессией в секундах.
+    """
+
+    def __init__(self, stream: MessageStream, timeout: float = 180.0):
+        self.stream = stream
+        self.timeout = timeout
+        self.channels = {}  # session_id -> MuxChannel
+        self.closed = False
+        self.last_used = time.monotonic()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._reader = None
+
+    def start(self) -> None:
+        """Переводит соединение в мультиплексированный режим и запускает поток чтения.
+
+        :raises ConnectionError: сервер не поддерживает мультиплексирование.
+        """
+
+        self.stream.send_json({jk.REQUEST: jk.MULTIPLEX})
+        if self.stream.recv_json().get(jk.MULTIPLEX_STATE) != jk.SUCCESSFUL:
+            raise ConnectionError("server does not support multiplexing")
+        # поток чтения ждёт без ограничения; время ожидания ответа отсчитывает каждая сессия
+        self.stream.socket.settimeout(None)
+        self._reader = threading.Thread(target=self._read, daemon=True)
+        self._reader.start()
+
+    def _read(self) -> None:
+        try:
+            while True:
+                message = self.stream.recv_json()
+                with self._lock:
+                    channel = self.channels.get(message.pop(jk.SESSION_ID, None))
+                if channel is not None:
+                    channel.deliver(message, self.stream.last_frame_len)
+        except (ConnectionError, OSError, ValueError):
+            pass
+        finally:
+            with self._lock:
+                self.closed = True
+                channels = list(self.channels.values())
+            for channel in channels:
+                channel.deliver(None, 0)
+
+    @property
+    def load(self) -> int:
+        return len(self.channels)
+
+    def open_channel(self) -> MuxChannel:
+        with self._lock:
+            if self.closed:
+                raise ConnectionError("multiplexed connection closed")
+            channel = MuxChannel(self, next(self._ids), self.timeout)
+            self.channels[channel.session_id] = channel
+            return channel
+
+    def close_channel(self, session_id: int) -> None:
+        with self._lock:
+            removed = self.channels.pop(session_id, None)
+            self.last_used = time.monotonic()
+        if removed is not None and not self.closed:
+            try:
+                self.send({jk.REQUEST: jk.SESSION_CLOSE, jk.SESSION_ID: session_id})
+            except OSError:
+                pass
+
+    def send(self, message: dict) -> int:
+        with self._send_lock:
+            return self.stream.send_json(message)
+
+    def close(self) -> None:
+        self.closed = True
+        try:
+            self.stream.socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.stream.close()
+
+
+class ConnectionPool:
+    """Пул соединений с сервером голосования.
+
+    В обычном режиме соединение выдаётся одному клиенту и после
+    :py:meth:`release` возвращается в пул, если при открытии сервер
+    подтвердил сброс сессии (:py:attr:`JsonKeys.SESSION_RESET`); иначе оно
+    закрывается. Перед повторной выдачей соединение проверяется
+    (:py:func:`is_alive`), простаивающие дольше ``idle_timeout`` закрываются. В мультиплексированном режиме :py:meth:`acquire` выдаёт
+    :py:class:`MuxChannel` — до ``max_channels`` сессий на одно соединение.
+
+    :param tuple address: адрес сервера ``(host, port)``.
+    :param int max_size: максимальное число соединений.
+    :param float idle_timeout: время простоя в секундах, после которого соединение закрывается.
+    :param float timeout: время ожидания ответа сервера в секундах.
+    :param str framing: режим кадрирования новых соединений.
+    :param int max_frame: максимальный размер кадра в байтах.
+    :param bool multiplex: мультиплексированный режим.
+    :param int max_channels: максимальное число сессий на соединение в мультиплексированном режиме.
+    """
+
+    def __init__(self, address: tuple[str, int], max_size: int = 8, idle_timeout: float = 60.0,
+                 timeout: float = 180.0, framing: str = FRAMING_RAW, max_frame: int = MAX_FRAME_LEN,
+                 multiplex: bool = False, max_channels: int = 64):
+        self.address = address
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.framing = framing
+        self.max_frame = max_frame
+        self.multiplex = multiplex
+        self.max_channels = max_channels
+
+        self._idle = []  # [(MessageStream, время возврата)], последним — самое «тёплое»
+        self._resettable = set()  # MessageStream, для которых сервер подтвердил сброс сессии
+        self._connections = []  # MultiplexedConnection
+        self._size = 0  # открытые и открывающиеся соединения
+        self._cond = threading.Condition()
+        self._closed = False
+
+        # metrics
+        self.created = 0
+        self.reused = 0
+        self.evicted = 0
+        self.unhealthy = 0
+
+    @classmethod
+    def from_env(cls) -> "ConnectionPool":
+        load_env()
+        return cls((os.getenv("HOST"), int(os.getenv("PORT"))),
+                   max_size=int(os.getenv("CONN_POOL_SIZE", 8)),
+                   idle_timeout=float(os.getenv("CONN_POOL_IDLE_TIMEOUT", 60)),
+                   framing=os.getenv("FRAMING", FRAMING_RAW),
+                   max_frame=int(os.getenv("MAX_FRAME_LEN", MAX_FRAME_LEN)),
+                   multiplex=os.getenv("CONN_POOL_MULTIPLEX", "").lower() in ("1", "true", "yes"),
+                   max_channels=int(os.getenv("CONN_POOL_MAX_CHANNELS", 64)))
+
+    def _connect(self) -> MessageStream:
+        sock = socket.create_connection(self.address, timeout=self.timeout)
+        stream = MessageStream(sock, max_frame=self.max_frame)
+        try:
+            stream.negotiate(self.framing)
+            if not self.multiplex:
+                self._negotiate_reset(stream)
+        except (ConnectionError, OSError, ValueError):
+            stream.close()
+            raise
+        return stream
+
+    def _negotiate_reset(self, stream: MessageStream) -> None:
+        # сервер без поддержки ответит на неизвестный запрос; такое соединение не используется повторно
+        stream.send_json({jk.REQUEST: jk.SESSION_RESET})
+        if stream.recv_json().get(jk.SESSION_RESET_STATE) == jk.SUCCESSFUL:
+            with self._cond:
+                self._resettable.add(stream)
+
+    def _open(self):
+        """Открывает соединение для заранее занятого места в пуле."""
+
+        try:
+            stream = self._connect()
+            if self.multiplex:
+                connection = MultiplexedConnection(stream, self.timeout)
+                try:
+                    connection.start()
+                except (ConnectionError, OSError, ValueError):
+                    connection.close()
+                    raise
+                stream = connection
+        except BaseException:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self.created += 1
+        return stream
+
+    def _wait(self, deadline: float | None) -> None:
+        remaining = None if deadline is None else deadline - time.monotonic()
+        if self._closed:
+            raise ConnectionError("connection pool closed")
+        if (remaining is not None and remaining <= 0) or not self._cond.wait(remaining):
+            raise TimeoutError("connection pool exhausted")
+
+    def acquire(self, timeout: float | None = None) -> "MessageStream | MuxChannel":
+        """Выдаёт соединение (в мультиплексированном режиме — сессию).
+
+        :param float timeout: время ожидания свободного места в пуле; ``None`` — без ограничения.
+        :raises TimeoutError: пул исчерпан и место не освободилось за ``timeout``.
+        """
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        if self.multiplex:
+            return self._acquire_channel(deadline)
+        return self._acquire_stream(deadline)
+
+    def _acquire_stream(self, deadline: float | None) -> MessageStream:
+        with self._cond:
+            while True:
+                self._evict_idle()
+                while self._idle:
+                    stream, _ = self._idle.pop()
+                    if is_alive(stream.socket):
+                        self.reused += 1
+                        return stream
+                    self.unhealthy += 1
+                    self._discard(stream)
+                if self._size < self.max_size:
+                    self._size += 1
+                    break
+                self._wait(deadline)
+        return self._open()
+
+    def _acquire_channel(self, deadline: float | None) -> MuxChannel:
+        with self._cond:
+            while True:
+                self._evict_idle()
+                # сессии заполняют уже открытые соединения, новое открывается, когда все заняты
+                available = [connection for connection in self._connections if connection.load < self.max_channels]
+                if available:
+                    self.reused += 1
+                    return max(available, key=lambda connection: connection.load).open_channel()
+                if self._size < self.max_size:
+                    self._size += 1
+                    break
+                self._wait(deadline)
+        connection = self._open()
+        with self._cond:
+            self._connections.append(connection)
+            return connection.open_channel()
+
+    def release(self, stream: "MessageStream | MuxChannel", discard: bool = False) -> None:
+        """Возвращает соединение в пул. Перед возвратом серверная сессия
+        завершается: следующий избиратель получает соединение без ключей,
+        ``n_id`` и аутентификации предыдущего.
+
+        :param stream: соединение, полученное через :py:meth:`acquire`.
+        :param bool discard: закрыть соединение, например после ошибки протокола.
+            Для :py:class:`MuxChannel` закрывается только эта сессия: общее
+            соединение закрывается, лишь если оно разорвано.
+
+        :example:
+        >>> from Client import REVClient
+        >>> from stand_in_server import start_in_thread
+        >>> server = start_in_thread()
+        >>> pool = ConnectionPool(server.server_address)
+        >>> alice = REVClient("Alice", "Liddell", "secret", connection_pool=pool)
+        >>> alice.rsa_key_exchange(); alice.blind_rsa_key_exchange()
+        >>> alice.registration_handler(), alice.authentication_handler()
+        (True, True)
+        >>> alice.get_crypt_params(); alice.close()
+        >>> mallory = REVClient("Mallory", "Malone", "guess", connection_pool=pool)
+        >>> pool.metrics()["reused"]
+        1
+        >>> mallory.blind_rsa_key_exchange()
+        >>> mallory.set_server_key(alice.server_pubkey_n, alice.server_pubkey_e)
+        >>> mallory.n_id, mallory.iden_num_len = alice.n_id, alice.iden_num_len
+        >>> mallory.blind_sign_request(); mallory.blind_sign_confirm()
+        'failed'
+        >>> mallory.close(); pool.close()
+
+        Сессии одного мультиплексированного соединения независимы:
+
+        >>> pool = ConnectionPool(server.server_address, multiplex=True)
+        >>> first, second = pool.acquire(), pool.acquire()
+        >>> first.connection is second.connection
+        True
+        >>> pool.release(first, discard=True)
+        >>> _ = second.send_json({jk.REQUEST: jk.CRYPT_STAGE_1_INIT, jk.FIRSTNAME: "Bob", jk.LASTNAME: "B"})
+        >>> second.recv_json()
+        {'id': None, 'iden_num_len': 100}
+        >>> pool.release(second); pool.metrics()["size"]
+        1
+        >>> pool.close(); server.shutdown()
+        """
+
+        if isinstance(stream, MuxChannel):
+            # SESSION_CLOSE завершает только эту сессию; остальные сессии соединения продолжают работу
+            stream.close()
+            with self._cond:
+                if stream.connection.closed:
+                    self._drop(stream.connection)
+                self._cond.notify()
+            return
+        if stream not in self._resettable:
+            # состояние сессии на сервере не сбросить: соединение нельзя передать другому избирателю
+            discard = True
+        if not (discard or self._closed or stream.decoder.pending):
+            try:
+                # сервер сбрасывает состояние сессии, ответа не ждём
+                stream.send_json({jk.REQUEST: jk.SESSION_CLOSE})
+            except OSError:
+                discard = True
+        with self._cond:
+            # непрочитанные данные означают, что обмен прерван посередине
+            if discard or self._closed or stream.decoder.pending or not is_alive(stream.socket):
+                self._discard(stream)
+            else:
+                self._idle.append((stream, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, timeout: float | None = None):
+        """Соединение из пула на время блока ``with``; при исключении оно закрывается."""
+
+        stream = self.acquire(timeout)
+        try:
+            yield stream
+        except BaseException:
+            self.release(stream, discard=True)
+            raise
+        self.release(stream)
+
+    def _discard(self, stream: MessageStream) -> None:
+        stream.close()
+        self._resettable.discard(stream)
+        self._size -= 1
+
+    def _drop(self, connection: MultiplexedConnection) -> None:
+        if connection in self._connections:
+            self._connections.remove(connection)
+            connection.close()
+            self._size -= 1
+
+    def _evict_idle(self) -> None:
+        expires = time.monotonic() - self.idle_timeout
+        while self._idle and self._idle[0][1] <= expires:
+            stream, _ = self._idle.pop(0)
+            self._discard(stream)
+            self.evicted += 1
+        for connection in list(self._connections):
+            if connection.closed:
+                self.unhealthy += 1
+                self._drop(connection)
+            elif not connection.load and connection.last_used <= expires:
+                self._drop(connection)
+                self.evicted += 1
+
+    def evict_idle(self) -> None:
+        """Закрывает соединения, простаивающие дольше ``idle_timeout``."""
+
+        with self._cond:
+            self._evict_idle()
+            self._cond.notify_all()
+
+    def metrics(self) -> dict:
+        with self._cond:
+            return {"size": self._size,
+                    "idle": len(self._idle),
+                    "channels": sum(connection.load for connection in self._connections),
+                    "created": self.created,
+                    "reused": self.reused,
+                    "evicted": self.evicted,
+                    "unhealthy": self.unhealthy}
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                self._discard(self._idle.pop()[0])
+            for connection in list(self._connections):
+                self._drop(connection)
+            self._cond.notify_all()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,86 @@
+import functools
+import os
+import threading
+from concurrent.futures import Executor, Future
+
+from settings import load_env
+
+CRYPTO_INLINE = "inline"  # в вызывающем потоке, как прежде
+CRYPTO_THREAD = "thread"  # пул потоков
+CRYPTO_PROCESS = "process"  # пул процессов: операции RSA не удерживают GIL клиента
+CRYPTO_BACKENDS = (CRYPTO_INLINE, CRYPTO_THREAD, CRYPTO_PROCESS)
+
+
+class CryptoExecutor(Executor):
+    """Исполнитель криптографических операций клиента.
+
+    Пул потоков или процессов создаётся при первой задаче. Задачи — функции
+    уровня модуля (:py:mod:`rsa`, :py:mod:`rev_crypt`), принимающие целые
+    числа и ключи :py:mod:`rsa`: процессам они передаются через ``pickle``,
+    который сериализует ``int`` в двоичном виде, а не десятичной строкой.
+    Исполнитель совместим с :py:meth:`asyncio.loop.run_in_executor`.
+
+    :param str backend: ``inline``, ``thread`` или ``process``.
+    :param int workers: число потоков или процессов; ``None`` — по числу процессоров.
+
+    :example:
+    >>> with CryptoExecutor(CRYPTO_THREAD, workers=2) as executor:
+    ...     executor.run(pow, 3, 5, 7), executor.submit(pow, 2, 10).result()
+    (5, 1024)
+    """
+
+    def __init__(self, backend: str = CRYPTO_INLINE, workers: int | None = None):
+        if backend not in CRYPTO_BACKENDS:
+            raise ValueError(f"unknown crypto executor: {backend}")
+        self.backend = backend
+        self.workers = workers
+        self._pool = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "CryptoExecutor":
+        load_env()
+        workers = os.getenv("CRYPTO_WORKERS")
+        return cls(os.getenv("CRYPTO_EXECUTOR") or CRYPTO_INLINE, int(workers) if workers else None)
+
+    def _get_pool(self) -> Executor:
+        with self._lock:
+            if self._pool is None:
+                if self.backend == CRYPTO_PROCESS:
+                    from concurrent.futures import ProcessPoolExecutor
+                    self._pool = ProcessPoolExecutor(max_workers=self.workers)
+                else:
+                    from concurrent.futures import ThreadPoolExecutor
+                    self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="crypto")
+            return self._pool
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        if self.backend != CRYPTO_INLINE:
+            return self._get_pool().submit(fn, *args, **kwargs)
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as exc:
+            future.set_exception(exc)
+        return future
+
+    def run(self, fn, /, *args, **kwargs):
+        """Выполняет ``fn`` в исполнителе и ожидает результат; вызывающий
+        поток на время ожидания освобождает GIL."""
+
+        if self.backend == CRYPTO_INLINE:
+            return fn(*args, **kwargs)
+        return self._get_pool().submit(fn, *args, **kwargs).result()
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+
+@functools.cache
+def default_executor() -> CryptoExecutor:
+    """Общий для процесса исполнитель, настроенный через ``.env``."""
+
+    return CryptoExecutor.from_env()
@@ -0,0 +1,84 @@
+import base64
+import json
+from typing import TYPE_CHECKING
+
+import sym_crypt
+from json_keys import JsonKeys as jk
+
+if TYPE_CHECKING:
+    import rsa
+
+ENCRYPTION_FIELD = "field"  # протокол по умолчанию: поле пароля шифруется RSA
+ENCRYPTION_HYBRID = "hybrid"  # сеансовый ключ передаётся под RSA, сообщения целиком — sym_crypt
+ENCRYPTION_MODES = (ENCRYPTION_FIELD, ENCRYPTION_HYBRID)
+
+# направление передачи входит в имитовставку: сообщение нельзя вернуть отправителю
+CLIENT_TO_SERVER = b"client->server"
+SERVER_TO_CLIENT = b"server->client"
+SEQUENCE_LEN = 8  # байтов на номер сообщения в имитовставке
+
+
+def wrap_key(key: bytes, public_key: "rsa.PublicKey") -> str:
+    """Шифрует сеансовый ключ открытым ключом RSA получателя.
+
+    :return: зашифрованный ключ в base64.
+    :rtype: str
+    """
+
+    import rsa
+
+    return base64.b64encode(rsa.encrypt(key, public_key)).decode()
+
+
+def unwrap_key(wrapped: str, private_key: "rsa.PrivateKey") -> bytes:
+    """Расшифровывает сеансовый ключ, полученный из :py:func:`wrap_key`."""
+
+    import rsa
+
+    return rsa.decrypt(base64.b64decode(wrapped), private_key)
+
+
+def _associated(direction: bytes, sequence: int) -> bytes:
+    return direction + sequence.to_bytes(SEQUENCE_LEN, "big")
+
+
+def seal(key: bytes, message: dict, direction: bytes, sequence: int) -> dict:
+    """Шифрует сообщение целиком. Направление и номер сообщения входят в
+    имитовставку: сообщение нельзя вернуть отправителю, повторить или
+    переставить.
+
+    :param bytes key: сеансовый ключ.
+    :param dict message: сообщение протокола.
+    :param bytes direction: :py:data:`CLIENT_TO_SERVER` или :py:data:`SERVER_TO_CLIENT`.
+    :param int sequence: номер сообщения в этом направлении, с нуля для каждого сеансового ключа.
+    :return: сообщение ``{"encrypted": ...}``.
+    :rtype: dict
+
+    :example:
+    >>> key = bytes(32)
+    >>> unseal(key, seal(key, {"password": "secret"}, CLIENT_TO_SERVER, 0), CLIENT_TO_SERVER, 0)
+    {'password': 'secret'}
+    >>> unseal(key, seal(key, {"password": "secret"}, CLIENT_TO_SERVER, 0), SERVER_TO_CLIENT, 0)
+    Traceback (most recent call last):
+    ...
+    ValueError: authentication failed
+    >>> unseal(key, seal(key, {"password": "secret"}, CLIENT_TO_SERVER, 0), CLIENT_TO_SERVER, 1)
+    Traceback (most recent call last):
+    ...
+    ValueError: authentication failed
+    """
+
+    blob = sym_crypt.encrypt(key, json.dumps(message).encode(), _associated(direction, sequence))
+    return {jk.ENCRYPTED: base64.b64encode(blob).decode()}
+
+
+def unseal(key: bytes, message: dict, direction: bytes, sequence: int) -> dict:
+    """Расшифровывает сообщение, полученное из :py:func:`seal`.
+
+    :param int sequence: ожидаемый номер сообщения в этом направлении.
+    :raises ValueError: при неверной имитовставке, повреждённых данных, а
+        также при повторе или перестановке сообщений.
+    """
+
+    return json.loads(sym_crypt.decrypt(key, base64.b64decode(message[jk.ENCRYPTED]),
+                                        _associated(direction, sequence)))
@@ -0,0 +1,269 @@
+import json
+import os
+import re
+import socket
+import struct
+
+from json_keys import JsonKeys as jk
+
+FRAMING_RAW = "raw"  # протокол по умолчанию: JSON без разделителей
+FRAMING_LENGTH = "length"  # 4-байтовый заголовок длины (big-endian) + JSON
+FRAMING_LINE = "line"  # JSON, завершённый символом перевода строки
+FRAMING_MODES = (FRAMING_RAW, FRAMING_LENGTH, FRAMING_LINE)
+
+HEADER = struct.Struct("!I")
+MAX_FRAME_LEN = 1 << 20
+RECV_SIZE = 16384
+
+_WHITESPACE = b" \t\r\n"
+_decoder = json.JSONDecoder()
+_TAIL = re.compile(r"[-+.\w]*\Z")  # последний незавершённый токен буфера
+_NUMBER_PREFIX = re.compile(r"-?\d*(\.\d*)?([eE][-+]?\d*)?\Z")
+_LITERALS = ("true", "false", "null")
+
+
+class FrameError(ValueError):
+    """Ошибка разбора кадра: превышен максимальный размер или нарушен формат."""
+
+
+def _truncated(text: str, exc: json.JSONDecodeError) -> bool:
+    """Ошибка разбора вызвана тем, что JSON обрезан на границе чтения, а не
+    ошибкой внутри данных.
+
+    :example:
+    >>> def error(text):
+    ...     try:
+    ...         _decoder.raw_decode(text)
+    ...     except json.JSONDecodeError as exc:
+    ...         return _truncated(text, exc)
+    >>> error('{"a": [1, '), error('{"a": "x'), error('{"a": tr'), error('{"a": 1.'), error(r'{"a": "\\u00')
+    (True, True, True, True, True)
+    >>> error('Internal Server Error'), error('{"a": xyz'), error(r'{"a": "\\q"}')
+    (False, False, False)
+    """
+
+    if exc.pos >= len(text) or exc.msg.startswith("Unterminated string"):
+        return True
+    if exc.msg.startswith("Invalid \\uXXXX escape"):
+        # декодер требует символ после ``uXXXX``: экранирование на самом конце буфера тоже незавершено
+        return len(text) - exc.pos <= 5
+    # число или литерал true/false/null, обрезанные на конце буфера
+    tail = _TAIL.search(text)
+    token = tail.group()
+    return (exc.pos >= tail.start() and token != ""
+            and (any(literal.startswith(token) for literal in _LITERALS) or bool(_NUMBER_PREFIX.match(token))))
+
+
+def encode_frame(payload: bytes, mode: str) -> list[bytes]:
+    """Формирует кадр для отправки в виде списка буферов (для ``sendmsg``).
+
+    :param bytes payload: сериализованное сообщение.
+    :param str mode: режим кадрирования.
+    :return: список буферов кадра.
+    :rtype: list[bytes]
+
+    :example:
+    >>> encode_frame(b'{}', FRAMING_LENGTH)
+    [b'\\x00\\x00\\x00\\x02', b'{}']
+    >>> encode_frame(b'{}', FRAMING_LINE)
+    [b'{}', b'\\n']
+    """
+
+    if mode == FRAMING_LENGTH:
+        return [HEADER.pack(len(payload)), payload]
+    if mode == FRAMING_LINE:
+        return [payload, b"\n"]
+    return [payload]
+
+
+class FrameDecoder:
+    """Разбор входящего потока байтов на кадры.
+
+    Данные читаются в переиспользуемый буфер ``bytearray`` (через
+    :py:meth:`recv_buffer` и ``recv_into``), готовые кадры возвращаются
+    срезами ``memoryview`` без копирования. Срез действителен до следующего
+    вызова :py:meth:`recv_buffer`.
+
+    :param str mode: режим кадрирования.
+    :param int max_frame: максимальный размер кадра в байтах.
+    """
+
+    def __init__(self, mode: str = FRAMING_RAW, max_frame: int = MAX_FRAME_LEN):
+        self.mode = mode
+        self.max_frame = max_frame
+        self._buf = bytearray(RECV_SIZE)
+        self._view = memoryview(self._buf)
+        self._start = 0
+        self._end = 0
+
+    def recv_buffer(self) -> memoryview:
+        """Возвращает свободную часть буфера для ``recv_into``. При нехватке
+        места непрочитанные данные сдвигаются в начало, а буфер расширяется."""
+
+        if self._start == self._end:
+            self._start = self._end = 0
+        if len(self._buf) - self._end < RECV_SIZE // 4:
+            pending = self._end - self._start
+            if pending > self.max_frame + HEADER.size:
+                raise FrameError("frame exceeds max_frame")
+            if len(self._buf) - pending < RECV_SIZE // 2:
+                buf = bytearray(len(self._buf) * 2)
+                buf[:pending] = self._view[self._start:self._end]
+                self._buf, self._view = buf, memoryview(buf)
+            else:
+                self._buf[:pending] = bytes(self._view[self._start:self._end])
+            self._start, self._end = 0, pending
+        return self._view[self._end:]
+
+    def advance(self, nbytes: int) -> None:
+        self._end += nbytes
+
+    @property
+    def pending(self) -> int:
+        """Число принятых, но ещё не разобранных байтов."""
+
+        return self._end - self._start
+
+    def feed(self, data: bytes) -> None:
+        while data:
+            buffer = self.recv_buffer()
+            chunk = min(len(buffer), len(data))
+            buffer[:chunk] = data[:chunk]
+            self.advance(chunk)
+            data = data[chunk:]
+
+    def next_frame(self) -> memoryview | None:
+        """Возвращает очередной полный кадр или ``None``, если данных недостаточно.
+
+        :example:
+        >>> decoder = FrameDecoder(FRAMING_LINE)
+        >>> decoder.feed(b'{"a": 1}\\n{"b"')
+        >>> bytes(decoder.next_frame())
+        b'{"a": 1}'
+        >>> decoder.next_frame() is None
+        True
+        """
+
+        if self.mode == FRAMING_LENGTH:
+            return self._next_length_frame()
+        if self.mode == FRAMING_LINE:
+            return self._next_line_frame()
+        return self._next_raw_frame()
+
+    def _next_length_frame(self) -> memoryview | None:
+        if self._end - self._start < HEADER.size:
+            return None
+        (length,) = HEADER.unpack_from(self._buf, self._start)
+        if length > self.max_frame:
+            raise FrameError(f"frame of {length} bytes exceeds max_frame={self.max_frame}")
+        begin = self._start + HEADER.size
+        if self._end - begin < length:
+            return None
+        self._start = begin + length
+        return self._view[begin:begin + length]
+
+    def _next_line_frame(self) -> memoryview | None:
+        newline = self._buf.find(b"\n", self._start, self._end)
+        if newline < 0:
+            if self._end - self._start > self.max_frame:
+                raise FrameError("frame exceeds max_frame")
+            return None
+        begin, self._start = self._start, newline + 1
+        return self._view[begin:newline]
+
+    def _next_raw_frame(self) -> memoryview | None:
+        # без разделителей границу сообщения определяет сам JSON-декодер
+        while self._start < self._end and self._buf[self._start] in _WHITESPACE:
+            self._start += 1
+        if self._start == self._end:
+            return None
+        try:
+            text = str(self._view[self._start:self._end], "utf-8")
+            _, end = _decoder.raw_decode(text)
+        except (UnicodeDecodeError, json.JSONDecodeError) as exc:
+            # ждать данных имеет смысл, только если сообщение обрезано на конце буфера
+            if isinstance(exc, UnicodeDecodeError):
+                truncated = exc.reason == "unexpected end of data"
+            else:
+                truncated = _truncated(text, exc)
+            if not truncated:
+                raise FrameError(f"invalid JSON message: {exc}") from None
+            if self._end - self._start > self.max_frame:
+                raise FrameError("frame exceeds max_frame")
+            return None
+        size = len(text[:end].encode()) if len(text) != self._end - self._start else end
+        begin, self._start = self._start, self._start + size
+        return self._view[begin:self._start]
+
+
+class MessageStream:
+    """JSON-сообщения поверх сокета с выбранным режимом кадрирования.
+
+    :param socket.socket sock: подключённый сокет.
+    :param str mode: режим кадрирования.
+    :param int max_frame: максимальный размер кадра в байтах.
+    """
+
+    def __init__(self, sock: socket.socket, mode: str = FRAMING_RAW, max_frame: int = MAX_FRAME_LEN):
+        self.socket = sock
+        self.mode = mode
+        self.decoder = FrameDecoder(mode, max_frame)
+        self.last_frame_len = 0
+
+    @classmethod
+    def from_env(cls, sock: socket.socket) -> "MessageStream":
+        return cls(sock, max_frame=int(os.getenv("MAX_FRAME_LEN", MAX_FRAME_LEN)))
+
+    def set_mode(self, mode: str) -> None:
+        if mode not in FRAMING_MODES:
+            raise FrameError(f"unknown framing mode: {mode}")
+        self.mode = mode
+        self.decoder.mode = mode
+
+    def negotiate(self, mode: str) -> str:
+        """Согласует режим кадрирования с сервером. Запрос и ответ передаются
+        в режиме :py:data:`FRAMING_RAW`; если сервер не подтвердил режим,
+        соединение остаётся в режиме по умолчанию.
+
+        :param str mode: желаемый режим кадрирования.
+        :return: установленный режим.
+        :rtype: str
+        """
+
+        if mode == FRAMING_RAW:
+            return self.mode
+        self.send_json({jk.REQUEST: jk.FRAMING, jk.FRAMING_MODE: mode})
+        if self.recv_json().get(jk.FRAMING_MODE) == mode:
+            self.set_mode(mode)
+        return self.mode
+
+    def send_bytes(self, payload: bytes) -> int:
+        buffers = encode_frame(payload, self.mode)
+        total = sum(len(buffer) for buffer in buffers)
+        if len(buffers) == 1 or not hasattr(self.socket, "sendmsg"):
+            self.socket.sendall(b"".join(buffers))
+            return total
+        sent = self.socket.sendmsg(buffers)
+        if sent < total:
+            self.socket.sendall(b"".join(buffers)[sent:])
+        return total
+
+    def recv_frame(self) -> memoryview:
+        while True:
+            frame = self.decoder.next_frame()
+            if frame is not None:
+                self.last_frame_len = len(frame)
+                return frame
+            nbytes = self.socket.recv_into(self.decoder.recv_buffer())
+            if not nbytes:
+                raise ConnectionError("connection closed by peer")
+            self.decoder.advance(nbytes)
+
+    def send_json(self, message: dict) -> int:
+        return self.send_bytes(json.dumps(message).encode())
+
+    def recv_json(self) -> dict:
+        return json.loads(str(self.recv_frame(), "utf-8"))
+
+    def close(self) -> None:
+        self.socket.close()
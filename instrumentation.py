@@ -0,0 +1,208 @@
+import functools
+import json
+import threading
+import time
+from contextlib import nullcontext
+
+SENT = "sent"
+RECEIVED = "received"
+
+PROMETHEUS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    """Перцентиль методом ближайшего ранга.
+
+    :example:
+    >>> percentile([1.0, 2.0, 3.0, 4.0], 50)
+    2.0
+    >>> percentile([1.0, 2.0, 3.0, 4.0], 99)
+    4.0
+    """
+
+    if not sorted_values:
+        return 0.0
+    rank = max(int(-(-p * len(sorted_values) // 100)), 1)
+    return sorted_values[rank - 1]
+
+
+class HistogramSink:
+    """Накопление измерений в памяти: все значения длительностей по этапам
+    и суммарный объём переданных байтов по типам сообщений."""
+
+    def __init__(self):
+        self.timings = {}
+        self.bytes = {SENT: {}, RECEIVED: {}}
+        self.messages = {SENT: {}, RECEIVED: {}}
+        self._lock = threading.Lock()
+
+    def record_timing(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.timings.setdefault(name, []).append(seconds)
+
+    def record_bytes(self, direction: str, message_type: str, nbytes: int) -> None:
+        with self._lock:
+            self.bytes[direction][message_type] = self.bytes[direction].get(message_type, 0) + nbytes
+            self.messages[direction][message_type] = self.messages[direction].get(message_type, 0) + 1
+
+    def summary(self) -> dict:
+        with self._lock:
+            timings = {name: sorted(values) for name, values in self.timings.items()}
+            return {"timings": {name: {"count": len(values),
+                                       "sum": sum(values),
+                                       "min": values[0],
+                                       "max": values[-1],
+                                       "p50": percentile(values, 50),
+                                       "p95": percentile(values, 95),
+                                       "p99": percentile(values, 99)}
+                                for name, values in timings.items()},
+                    "bytes": {direction: dict(totals) for direction, totals in self.bytes.items()},
+                    "messages": {direction: dict(totals) for direction, totals in self.messages.items()}}
+
+
+class JsonLinesSink:
+    """Запись каждого измерения отдельной строкой JSON.
+
+    :param str path: путь к файлу; записи дописываются в конец.
+    """
+
+    def __init__(self, path: str):
+        self.file = open(path, "a", buffering=1)
+        self._lock = threading.Lock()
+
+    def _write(self, record: dict) -> None:
+        line = json.dumps(record)
+        with self._lock:
+            self.file.write(line + "\n")
+
+    def record_timing(self, name: str, seconds: float) -> None:
+        self._write({"type": "timing", "name": name, "seconds": seconds, "ts": time.time()})
+
+    def record_bytes(self, direction: str, message_type: str, nbytes: int) -> None:
+        self._write({"type": "bytes", "direction": direction, "message_type": message_type,
+                     "bytes": nbytes, "ts": time.time()})
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class PrometheusSink:
+    """Гистограммы длительностей и счётчики байтов в текстовом формате
+    Prometheus (см. :py:meth:`render`).
+
+    :param str prefix: префикс имён метрик.
+    """
+
+    def __init__(self, prefix: str = "rev_client"):
+        self.prefix = prefix
+        self.histograms = {}  # name -> [counts по корзинам, сумма, количество]
+        self.bytes = {}  # (direction, message_type) -> байты
+        self._lock = threading.Lock()
+
+    def record_timing(self, name: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self.histograms.setdefault(name, [[0] * len(PROMETHEUS_BUCKETS), 0.0, 0])
+            for i, bound in enumerate(PROMETHEUS_BUCKETS):
+                if seconds <= bound:
+                    histogram[0][i] += 1
+            histogram[1] += seconds
+            histogram[2] += 1
+
+    def record_bytes(self, direction: str, message_type: str, nbytes: int) -> None:
+        with self._lock:
+            key = (direction, message_type)
+            self.bytes[key] = self.bytes.get(key, 0) + nbytes
+
+    def render(self) -> str:
+        seconds = f"{self.prefix}_stage_seconds"
+        total = f"{self.prefix}_bytes_total"
+        lines = [f"# TYPE {seconds} histogram"]
+        with self._lock:
+            for name, (counts, sum_, count) in sorted(self.histograms.items()):
+                for bound, bucket in zip(PROMETHEUS_BUCKETS, counts):
+                    lines.append(f'{seconds}_bucket{{stage="{name}",le="{bound}"}} {bucket}')
+                lines.append(f'{seconds}_bucket{{stage="{name}",le="+Inf"}} {count}')
+                lines.append(f'{seconds}_sum{{stage="{name}"}} {sum_}')
+                lines.append(f'{seconds}_count{{stage="{name}"}} {count}')
+            lines.append(f"# TYPE {total} counter")
+            for (direction, message_type), nbytes in sorted(self.bytes.items()):
+                lines.append(f'{total}{{direction="{direction}",message_type="{message_type}"}} {nbytes}')
+        return "\n".join(lines) + "\n"
+
+
+class _Stage:
+    __slots__ = ("instrumentation", "name", "start")
+
+    def __init__(self, instrumentation: "Instrumentation", name: str):
+        self.instrumentation = instrumentation
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.instrumentation.record_timing(self.name, (time.perf_counter_ns() - self.start) / 1e9)
+
+
+class Instrumentation:
+    """Измерение длительности этапов протокола и криптографических операций
+    и подсчёт переданных байтов. Измерения передаются во все ``sinks``.
+
+    :example:
+    >>> sink = HistogramSink()
+    >>> instrumentation = Instrumentation(sink)
+    >>> with instrumentation.stage("key_exchange"):
+    ...     pass
+    >>> instrumentation.count_bytes(SENT, "key_exchange", 120)
+    >>> sink.summary()["timings"]["key_exchange"]["count"], sink.summary()["bytes"][SENT]
+    (1, {'key_exchange': 120})
+    """
+
+    enabled = True
+
+    def __init__(self, *sinks):
+        self.sinks = sinks
+
+    def stage(self, name: str) -> _Stage:
+        return _Stage(self, name)
+
+    def record_timing(self, name: str, seconds: float) -> None:
+        for sink in self.sinks:
+            sink.record_timing(name, seconds)
+
+    def count_bytes(self, direction: str, message_type: str, nbytes: int) -> None:
+        for sink in self.sinks:
+            sink.record_bytes(direction, message_type, nbytes)
+
+
+class NullInstrumentation:
+    """Отключённые измерения: все вызовы — пустые операции."""
+
+    enabled = False
+    _null_stage = nullcontext()
+
+    def stage(self, name: str) -> nullcontext:
+        return self._null_stage
+
+    def record_timing(self, name: str, seconds: float) -> None:
+        pass
+
+    def count_bytes(self, direction: str, message_type: str, nbytes: int) -> None:
+        pass
+
+
+NULL_INSTRUMENTATION = NullInstrumentation()
+
+
+def timed(name: str):
+    """Декоратор метода: время выполнения записывается под именем ``name``
+    в ``self.instrumentation``."""
+
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.instrumentation.stage(name):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
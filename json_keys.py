@@ -1,12 +1,26 @@
 class JsonKeys:
     REQUEST = "request"
 
+    FRAMING = "framing"
+    FRAMING_MODE = "framing_mode"
+
+    MULTIPLEX = "multiplex"
+    MULTIPLEX_STATE = "multiplex_state"
+    SESSION_ID = "session_id"
+    SESSION_CLOSE = "session_close"
+    SESSION_RESET = "session_reset"
+    SESSION_RESET_STATE = "session_reset_state"
+
     KEY_EXCHANGE = "key_exchange"
     BLIND_KEY_EXCHANGE = "blind_key_exchange"
     KEYEX_CLIENT_PUB_N = "client_pubkey_n"
     KEYEX_CLIENT_PUB_E = "client_pubkey_e"
     KEYEX_SERVER_PUB_N = "server_pubkey_n"
     KEYEX_SERVER_PUB_E = "server_pubkey_e"
+    INT_ENCODING = "int_encoding"
+    ENCRYPTION = "encryption"
+    SESSION_KEY = "session_key"
+    ENCRYPTED = "encrypted"
 
     REGISTRATION = "registration"
     REG_STATE = "reg_state"
@@ -14,6 +28,10 @@ class JsonKeys:
     AUTENTICATION = "authentication"
     AUTH_STATE = "auth_state"
 
+    RESUME = "resume"
+    RESUME_STATE = "resume_state"
+    SESSION_TOKEN = "session_token"
+
     CRYPT_STAGE_1_INIT = "CRYPT_STAGE_1_INIT"
     CRYPT_STAGE_1_RESPONSE = "CRYPT_STAGE_1_RESPONSE"
 
@@ -22,6 +40,7 @@ class JsonKeys:
     BLIND_SIGN_RESPONSE = "blind_sign_response"
     BLIND_SIGN_CONFIRM_REQUEST = "blind_sign_confirm_request"
     BLIND_SIGN_CONFIRM = "blind_sign_confirm"
+    BLIND_SIGN_BATCH = "blind_sign_batch"
 
     VOTER_ID = "id"
     IDEN_NUM_LEN = "iden_num_len"
@@ -0,0 +1,193 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import rsa
+
+import sym_crypt
+from settings import load_env
+
+
+def _newkeys_timed(bits: int) -> tuple[rsa.PublicKey, rsa.PrivateKey, float]:
+    start = time.perf_counter()
+    public_key, private_key = rsa.newkeys(bits)
+    return public_key, private_key, time.perf_counter() - start
+
+
+class RSAKeyPool:
+    """Пул заранее сгенерированных пар ключей RSA.
+
+    Ключи генерируются в фоне пулом процессов. Когда число готовых пар
+    для какой-либо длины ключа опускается ниже ``low_watermark``, пул
+    дозаполняется до ``size``. Выдача ключа из пула — O(1); при промахе
+    пара генерируется синхронно.
+
+    :param list[int] key_lens: длины ключей, для которых держится запас.
+    :param int size: число готовых пар для каждой длины ключа.
+    :param int low_watermark: порог, при котором запускается дозаполнение.
+    :param int workers: число процессов генерации.
+    :param str store_path: путь к зашифрованному хранилищу ключей (необязательно).
+    :param str store_key: парольная фраза хранилища.
+    """
+
+    def __init__(self, key_lens: list[int], size: int = 8, low_watermark: int = 2,
+                 workers: int | None = None, store_path: str | None = None,
+                 store_key: str | None = None):
+        self.key_lens = list(key_lens)
+        self.size = size
+        self.low_watermark = low_watermark
+        self.workers = workers
+        self.store_path = store_path
+        self.store_key = store_key
+
+        self._keys = {bits: deque() for bits in self.key_lens}
+        self._pending = {bits: 0 for bits in self.key_lens}
+        self._lock = threading.Lock()
+        self._executor = None
+
+        # metrics
+        self.hits = 0
+        self.misses = 0
+        self.generated = 0
+        self.refill_time = 0.0
+
+    @classmethod
+    def from_env(cls) -> "RSAKeyPool":
+        load_env()
+        key_lens = sorted({int(os.getenv("RSA_KEY_LEN")), int(os.getenv("RSA_BLIND_KEY_LEN"))})
+        workers = os.getenv("KEY_POOL_WORKERS")
+        return cls(key_lens,
+                   size=int(os.getenv("KEY_POOL_SIZE", 8)),
+                   low_watermark=int(os.getenv("KEY_POOL_LOW_WATERMARK", 2)),
+                   workers=int(workers) if workers else None,
+                   store_path=os.getenv("KEY_POOL_STORE") or None,
+                   store_key=os.getenv("KEY_POOL_STORE_KEY") or None)
+
+    def start(self) -> "RSAKeyPool":
+        from concurrent.futures import ProcessPoolExecutor
+
+        self.load()
+        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        for bits in self.key_lens:
+            self._refill(bits)
+        return self
+
+    def get(self, bits: int) -> tuple[rsa.PublicKey, rsa.PrivateKey]:
+        """Выдаёт пару ключей заданной длины.
+
+        :param int bits: длина ключа.
+        :return: ``(public_key, private_key)``.
+        :rtype: tuple[rsa.PublicKey, rsa.PrivateKey]
+        """
+
+        with self._lock:
+            keys = self._keys.get(bits)
+            pair = keys.popleft() if keys else None
+            if pair is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if bits in self._keys:
+            self._refill(bits)
+        return pair if pair is not None else rsa.newkeys(bits)
+
+    def available(self, bits: int) -> int:
+        return len(self._keys.get(bits, ()))
+
+    def wait_ready(self, timeout: float | None = None) -> bool:
+        """Ожидает, пока пул не будет заполнен до ``size`` по всем длинам ключей.
+
+        :param float timeout: максимальное время ожидания в секундах.
+        :return: ``True``, если пул заполнен.
+        :rtype: bool
+        """
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while any(self.available(bits) < self.size for bits in self.key_lens):
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits,
+                    "misses": self.misses,
+                    "generated": self.generated,
+                    "refill_time": self.refill_time,
+                    "avg_refill_time": self.refill_time / self.generated if self.generated else 0.0,
+                    "available": {bits: len(keys) for bits, keys in self._keys.items()},
+                    "pending": dict(self._pending)}
+
+    def _refill(self, bits: int) -> None:
+        if self._executor is None:
+            return
+        with self._lock:
+            ready = len(self._keys[bits]) + self._pending[bits]
+            if ready > self.low_watermark:
+                return
+            count = max(self.size - ready, 0)
+            self._pending[bits] += count
+        for _ in range(count):
+            future = self._executor.submit(_newkeys_timed, bits)
+            future.add_done_callback(lambda f, b=bits: self._on_generated(b, f))
+
+    def _on_generated(self, bits: int, future) -> None:
+        with self._lock:
+            self._pending[bits] -= 1
+            if future.cancelled() or future.exception() is not None:
+                return
+            public_key, private_key, elapsed = future.result()
+            self._keys[bits].append((public_key, private_key))
+            self.generated += 1
+            self.refill_time += elapsed
+
+    def load(self) -> None:
+        """Загружает ключи из зашифрованного хранилища. Загруженные ключи
+        удаляются из хранилища, чтобы не выдать одну пару дважды; хранилище,
+        которое не удалось расшифровать, не удаляется."""
+
+        if not self.store_path or not self.store_key or not os.path.exists(self.store_path):
+            return
+        with open(self.store_path, "rb") as file:
+            blob = file.read()
+        try:
+            data = json.loads(sym_crypt.decrypt_with_passphrase(self.store_key, blob))
+            loaded = {int(bits): [rsa.PrivateKey.load_pkcs1(pem.encode()) for pem in pems]
+                      for bits, pems in data.items()}
+        except ValueError:
+            return  # повреждённое хранилище или другая парольная фраза: начинаем с пустого пула
+        os.remove(self.store_path)
+        with self._lock:
+            for bits, private_keys in loaded.items():
+                keys = self._keys.get(bits)
+                if keys is None:
+                    continue
+                keys.extend((rsa.PublicKey(private_key.n, private_key.e), private_key)
+                            for private_key in private_keys)
+
+    def save(self) -> None:
+        """Сохраняет оставшиеся ключи в зашифрованное хранилище."""
+
+        if not self.store_path or not self.store_key:
+            return
+        with self._lock:
+            data = {bits: [private_key.save_pkcs1().decode() for _, private_key in keys]
+                    for bits, keys in self._keys.items()}
+        blob = sym_crypt.encrypt_with_passphrase(self.store_key, json.dumps(data).encode())
+        with open(self.store_path, "wb") as file:
+            file.write(blob)
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        self.save()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
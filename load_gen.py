@@ -0,0 +1,147 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from instrumentation import percentile
+from settings import load_env
+
+# env
+load_env()
+
+CONNECTION_MODES = ("direct", "pool", "multiplex")
+STAGES = ("keygen", "key_exchange", "registration", "authentication", "crypt_params", "blind_sign", "confirm")
+
+
+def run_session(firstname: str, lastname: str, password: str, connection_pool=None) -> dict[str, float]:
+    """Выполняет одну сессию :py:class:`Client.REVClient` и возвращает
+    длительность каждого этапа в секундах."""
+
+    from Client import REVClient
+
+    timings = {}
+    start = time.perf_counter()
+    client = REVClient(firstname, lastname, password, connection_pool=connection_pool)
+    stages = (("key_exchange", lambda: (client.rsa_key_exchange(), client.blind_rsa_key_exchange())),
+              ("registration", client.registration_handler),
+              ("authentication", client.authentication_handler),
+              ("crypt_params", client.get_crypt_params),
+              ("blind_sign", client.blind_sign_request),
+              ("confirm", client.blind_sign_confirm))
+    now = time.perf_counter()
+    timings["keygen"], start = now - start, now
+    result = None
+    try:
+        for name, stage in stages:
+            result = stage()
+            now = time.perf_counter()
+            timings[name], start = now - start, now
+    except BaseException:
+        # обмен прерван посередине: соединение не возвращается в пул
+        client.close(discard=True)
+        raise
+    client.close()
+    if result is not True:
+        raise RuntimeError(f"blind signature failed: {result}")
+    return timings
+
+
+def run_worker(worker: int, sessions: int, threads: int, connections: str = "direct") -> dict:
+    """Выполняет ``sessions`` сессий в ``threads`` потоках одного процесса.
+    ``connections`` — способ подключения: отдельное соединение на сессию,
+    пул соединений или мультиплексированный пул (:py:mod:`connection_pool`)."""
+
+    voters = [(f"load{os.getpid()}w{worker}v{i}", f"voter{i}", f"password{i}") for i in range(sessions)]
+    samples = {stage: [] for stage in STAGES}
+    totals = []
+    errors = 0
+    connection_pool = None
+    if connections != "direct":
+        from connection_pool import ConnectionPool
+        connection_pool = ConnectionPool.from_env()
+        connection_pool.multiplex = connections == "multiplex"
+
+    def session(voter):
+        start = time.perf_counter()
+        timings = run_session(*voter, connection_pool=connection_pool)
+        return timings, time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        futures = [executor.submit(session, voter) for voter in voters]
+        for future in futures:
+            try:
+                timings, total = future.result()
+            except Exception:
+                errors += 1
+                continue
+            totals.append(total)
+            for stage, value in timings.items():
+                samples[stage].append(value)
+    if connection_pool is not None:
+        connection_pool.close()
+    return {"samples": samples, "totals": totals, "errors": errors}
+
+
+def summarize(values: list[float]) -> dict:
+    values = sorted(values)
+    return {"count": len(values),
+            "mean": sum(values) / len(values) if values else 0.0,
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "p99": percentile(values, 99)}
+
+
+def main(argv=None) -> dict:
+    parser = argparse.ArgumentParser(description="REV client load generator")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--sessions", type=int, default=10, help="sessions per worker")
+    parser.add_argument("--threads", type=int, default=1, help="concurrent sessions per worker")
+    parser.add_argument("--connections", choices=CONNECTION_MODES, default="direct",
+                        help="one socket per session, a connection pool, or a multiplexed pool")
+    parser.add_argument("--host", help="target server; the bundled stand-in server is used if omitted")
+    parser.add_argument("--port", type=int)
+    parser.add_argument("--output", help="write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    server = None
+    if args.host is None:
+        from stand_in_server import start_in_thread
+        server = start_in_thread()
+        args.host, args.port = server.server_address
+    os.environ["HOST"], os.environ["PORT"] = args.host, str(args.port)
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        results = list(executor.map(run_worker, range(args.workers),
+                                    [args.sessions] * args.workers, [args.threads] * args.workers,
+                                    [args.connections] * args.workers))
+    elapsed = time.perf_counter() - start
+    if server is not None:
+        server.shutdown()
+
+    totals = [value for result in results for value in result["totals"]]
+    report = {"config": {"workers": args.workers,
+                         "sessions_per_worker": args.sessions,
+                         "threads": args.threads,
+                         "connections": args.connections,
+                         "rsa_key_len": int(os.getenv("RSA_KEY_LEN")),
+                         "rsa_blind_key_len": int(os.getenv("RSA_BLIND_KEY_LEN"))},
+              "sessions": len(totals),
+              "errors": sum(result["errors"] for result in results),
+              "elapsed": elapsed,
+              "throughput": len(totals) / elapsed,
+              "total": summarize(totals),
+              "stages": {stage: summarize([value for result in results for value in result["samples"][stage]])
+                         for stage in STAGES}}
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output)
+    print(output)
+    return report
+
+
+if __name__ == '__main__':
+    main()
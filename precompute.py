@@ -0,0 +1,146 @@
+import os
+import threading
+from collections import deque
+from typing import NamedTuple, TYPE_CHECKING
+
+from rev_crypt import generate_iden_num_batch, gcd_and_simpl_batch, mask_factors, mask_batch, inverse_batch
+from settings import load_env
+
+if TYPE_CHECKING:
+    from crypto_executor import CryptoExecutor
+
+CHUNK = 16  # наборов за одну фоновую задачу: готовые части сразу доступны для выдачи
+
+
+class BlindMaterial(NamedTuple):
+    iden_num: int  # I
+    masking_factor: int  # r
+    masked_factor: int  # r^e mod n
+    masked_iden_num: int  # I_m = I * r^e mod n
+    inverse: int  # r^-1 mod n
+
+
+def build_blind_material(e: int, n: int, iden_num_len: int, count: int) -> list[BlindMaterial]:
+    """Строит ``count`` наборов для слепой подписи: идентификационный номер,
+    маскирующий множитель, его степень ``e``, замаскированный номер и
+    обратный множитель для демаскирования.
+
+    :param int e: открытая экспонента сервера.
+    :param int n: модуль открытого ключа сервера.
+    :param int iden_num_len: длина идентификационного номера.
+    :param int count: количество наборов.
+    :rtype: list[BlindMaterial]
+
+    :example:
+    >>> [material] = build_blind_material(3, 55, 1, 1)
+    >>> material.masked_iden_num == material.iden_num * pow(material.masking_factor, 3, 55) % 55
+    True
+    >>> material.masking_factor * material.inverse % 55
+    1
+    """
+
+    iden_nums = generate_iden_num_batch(iden_num_len, count)
+    factors = gcd_and_simpl_batch(n, count)
+    masked_factors = mask_factors(factors, e, n)
+    masked = mask_batch(iden_nums, factors, e, n, masked_factors)
+    return [BlindMaterial(*values) for values in zip(iden_nums, factors, masked_factors, masked,
+                                                      inverse_batch(factors, n))]
+
+
+class PrecomputeStore:
+    """Запас заранее вычисленных наборов :py:class:`BlindMaterial` для
+    открытого ключа сервера. Запас заполняется в фоновом потоке частями по
+    :py:data:`CHUNK`; вычисления выполняются в ``executor``. При выдаче
+    недостающие наборы строятся на месте, а наборы, построенные для другой
+    длины номера, используются повторно: сохраняются множители, а номер и
+    замаскированное значение вычисляются заново.
+
+    :param int e: открытая экспонента сервера.
+    :param int n: модуль открытого ключа сервера.
+    :param int iden_num_len: ожидаемая длина идентификационного номера.
+    :param int size: число наборов в запасе.
+    :param CryptoExecutor executor: исполнитель вычислений; ``None`` — в фоновом потоке.
+    """
+
+    def __init__(self, e: int, n: int, iden_num_len: int, size: int = 1,
+                 executor: "CryptoExecutor | None" = None):
+        self.e = e
+        self.n = n
+        self.iden_num_len = iden_num_len
+        self.size = size
+        self.executor = executor
+
+        self._available = deque()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+        # metrics
+        self.ready = 0
+        self.reused = 0
+        self.on_demand = 0
+
+    @classmethod
+    def from_env(cls, e: int, n: int, iden_num_len: int | None = None,
+                 executor: "CryptoExecutor | None" = None) -> "PrecomputeStore":
+        load_env()
+        return cls(e, n, iden_num_len or int(os.getenv("PRECOMPUTE_IDEN_NUM_LEN", 100)),
+                   size=int(os.getenv("PRECOMPUTE_SIZE", 1)), executor=executor)
+
+    def start(self) -> "PrecomputeStore":
+        """Запускает фоновое заполнение запаса до ``size`` наборов."""
+
+        if self.size > 0 and (self._thread is None or not self._thread.is_alive()):
+            self._thread = threading.Thread(target=self._fill, daemon=True)
+            self._thread.start()
+        return self
+
+    def _build(self, iden_num_len: int, count: int) -> list[BlindMaterial]:
+        if self.executor is None:
+            return build_blind_material(self.e, self.n, iden_num_len, count)
+        return self.executor.run(build_blind_material, self.e, self.n, iden_num_len, count)
+
+    def _fill(self) -> None:
+        while not self._stopped.is_set():
+            with self._lock:
+                missing = self.size - len(self._available)
+            if missing <= 0:
+                return
+            chunk = self._build(self.iden_num_len, min(missing, CHUNK))
+            with self._lock:
+                self._available.extend(chunk)
+
+    @property
+    def available(self) -> int:
+        return len(self._available)
+
+    def take(self, count: int, iden_num_len: int) -> list[BlindMaterial]:
+        """Выдаёт ``count`` наборов для идентификационных номеров длины
+        ``iden_num_len``. Не ждёт фонового заполнения: чего нет в запасе,
+        строится на месте."""
+
+        with self._lock:
+            taken = [self._available.popleft() for _ in range(min(count, len(self._available)))]
+        if taken and iden_num_len != self.iden_num_len:
+            # длина номера отличается от ожидаемой: множители годятся, номера — нет
+            iden_nums = generate_iden_num_batch(iden_num_len, len(taken))
+            masked = mask_batch(iden_nums, [material.masking_factor for material in taken], self.e, self.n,
+                                [material.masked_factor for material in taken])
+            taken = [material._replace(iden_num=iden_num, masked_iden_num=masked_iden_num)
+                     for material, iden_num, masked_iden_num in zip(taken, iden_nums, masked)]
+            self.reused += len(taken)
+        else:
+            self.ready += len(taken)
+        if len(taken) < count:
+            self.on_demand += count - len(taken)
+            taken += self._build(iden_num_len, count - len(taken))
+        return taken
+
+    def metrics(self) -> dict:
+        return {"ready": self.ready,
+                "reused": self.reused,
+                "on_demand": self.on_demand,
+                "available": self.available}
+
+    def close(self) -> None:
+        self._stopped.set()
@@ -1,10 +1,11 @@
-import copy
+import itertools
 import math
-import string
-from random import choice
+import os
+import secrets
+from typing import TYPE_CHECKING
 
-import rsa
-from sympy import isprime, randprime
+if TYPE_CHECKING:
+    import rsa
 
 
 def is_prime(num: int) -> bool:
@@ -21,27 +22,68 @@ def is_prime(num: int) -> bool:
     False
     """
 
+    # sympy необязателен и тяжёл при импорте, поэтому загружается только здесь
+    try:
+        from sympy import isprime
+    except ImportError:
+        from rsa.prime import is_prime as isprime
     return isprime(num)
 
 
 def gcd_and_simpl(n: int) -> int:
-    """Возвращает случайное простое число, взаимнопростое с аргументом.
+    """Возвращает случайное число, взаимнопростое с аргументом (маскирующий
+    множитель). Для слепой подписи RSA достаточно обратимого по модулю ``n``
+    числа, простота не требуется. Число выбирается криптографически стойким
+    генератором :py:mod:`secrets`.
 
-    :param int n: число для проверки.
-    :return: случайное простое число взаимнопростое с проверяемым.
+    :param int n: модуль.
+    :return: случайное число из ``[2, n)``, взаимнопростое с ``n``.
     :rtype: int
 
     :example:
-    >>> gcd_and_simpl(65537)
-    16187
-    >>> gcd_and_simpl(65537)
-    5693
+    >>> math.gcd(gcd_and_simpl(65537), 65537)
+    1
+    >>> 2 <= gcd_and_simpl(55) < 55
+    True
     """
 
     while True:
-        rand_prime = randprime(1, n)
-        if math.gcd(n, rand_prime):
-            return rand_prime
+        masking_factor = secrets.randbelow(n - 2) + 2
+        if math.gcd(n, masking_factor) == 1:
+            return masking_factor
+
+
+def gcd_and_simpl_batch(n: int, count: int) -> list[int]:
+    """Генерирует ``count`` маскирующих множителей для модуля ``n``.
+    Случайные байты для всего пакета читаются из :py:func:`os.urandom`
+    одним буфером, значения выбираются методом отбраковки.
+
+    :param int n: модуль.
+    :param int count: количество множителей.
+    :return: список случайных чисел из ``[2, n)``, взаимнопростых с ``n``.
+    :rtype: list[int]
+
+    :example:
+    >>> factors = gcd_and_simpl_batch(65537, 100)
+    >>> len(factors), all(math.gcd(f, 65537) == 1 and 2 <= f < 65537 for f in factors)
+    (100, True)
+    """
+
+    bits = n.bit_length()
+    width = (bits + 7) // 8
+    shift = width * 8 - bits
+    factors = []
+    while len(factors) < count:
+        # с запасом на отбраковку: вероятность принять значение не меньше 1/2
+        need = count - len(factors)
+        buffer = os.urandom(width * (2 * need + 8))
+        for offset in range(0, len(buffer), width):
+            masking_factor = int.from_bytes(buffer[offset:offset + width], "big") >> shift
+            if 2 <= masking_factor < n and math.gcd(n, masking_factor) == 1:
+                factors.append(masking_factor)
+                if len(factors) == count:
+                    break
+    return factors
 
 
 def mask(int_msg: int, masking_factor: int, e: int, n: int) -> int:
@@ -61,8 +103,7 @@ def mask(int_msg: int, masking_factor: int, e: int, n: int) -> int:
     15804088622747537301875565728207539776273377157425810978093837786966335723601915960255638517505727709894733882204357257130559608543968191817629193774004996110066652756853462892227262007219418801091566381919388381257450621255278408795628137952274007990108747700383069936154014046337036129790803362207900142248225918254278942696843952812478948709309412617290576850997355012598812053944646050707955564852281896237449187981507010032225464639149571499905312365781683711239401487152704111639495680244408938561808856383855181151174128384098250662632445014745528556726039491062173710639287709103689143586876095991737589071342
     """
 
-    int_msg_ = copy.deepcopy(int_msg)
-    return pow(int_msg_*pow(masking_factor, e, n), 1, n)
+    return int_msg * pow(masking_factor, e, n) % n
 
 
 def demask(int_msg: int, masking_factor: int, n: int) -> int:
@@ -81,9 +122,95 @@ def demask(int_msg: int, masking_factor: int, n: int) -> int:
     8931535887828620156093874273919057257065334579009478491419645781554454173379404847347250616829916883341532146794735904568424195437155596713962746571029627579205642926456129577861116718656997743835285679942786648660788718289232486463249114928340976648150678252820947757025499227953441661424691513241288673666245016761646523750117134875916481932207101256213265644863842177177938538950583001157247131072668658595153481647691256716177687415062225555340342840539934174535598264955459513474189957162392806559017023148456489739391134676304720545885142272417661176013894892811807819827225113560426258391199052993426309937885
     """
 
-    int_msg_ = copy.deepcopy(int_msg)
-    m_ = pow(masking_factor, -1, n)
-    return pow(int_msg_ * m_, 1, n)
+    return int_msg * pow(masking_factor, -1, n) % n
+
+
+def inverse_batch(values: list[int], n: int) -> list[int]:
+    """Обратные по модулю ``n`` для списка чисел с одним вычислением
+    обратного (метод Монтгомери): по префиксным произведениям обращается
+    только их общее произведение, остальные обратные получаются умножениями.
+
+    :param list[int] values: числа, взаимнопростые с ``n``.
+    :param int n: модуль.
+    :return: список ``pow(v, -1, n)`` для каждого ``v``.
+    :rtype: list[int]
+    :raises ValueError: одно из чисел не обратимо по модулю ``n``.
+
+    :example:
+    >>> inverse_batch([2, 3, 7], 55)
+    [28, 37, 8]
+    >>> inverse_batch([2, 3, 7], 55) == [pow(v, -1, 55) for v in (2, 3, 7)]
+    True
+    """
+
+    prefix = list(itertools.accumulate(values, lambda acc, value: acc * value % n))
+    if not prefix:
+        return []
+    inverse = pow(prefix[-1], -1, n)
+    inverses = [0] * len(values)
+    for i in range(len(values) - 1, 0, -1):
+        inverses[i] = inverse * prefix[i - 1] % n
+        inverse = inverse * values[i] % n
+    inverses[0] = inverse
+    return inverses
+
+
+def mask_factors(masking_factors: list[int], e: int, n: int) -> list[int]:
+    """Степени ``masking_factor^e mod n`` для списка маскирующих множителей,
+    которые можно вычислить заранее и передать в :py:func:`mask_batch`.
+
+    :example:
+    >>> mask_factors([2, 3], 3, 55)
+    [8, 27]
+    """
+
+    return list(map(pow, masking_factors, itertools.repeat(e), itertools.repeat(n)))
+
+
+def mask_batch(int_msg: list[int], masking_factors: list[int], e: int, n: int,
+               masked_factors: list[int] | None = None) -> list[int]:
+    """Маскирование списка чисел, каждое — своим множителем. Результат
+    совпадает с :py:func:`mask` для каждой пары.
+
+    :param list[int] int_msg: числа для маскирования.
+    :param list[int] masking_factors: маскирующие множители.
+    :param int e: открытая экспонента, первая часть открытого ключа RSA.
+    :param int n: вторая часть открытого ключа RSA.
+    :param list[int] masked_factors: заранее вычисленные :py:func:`mask_factors`.
+    :return: список замаскированных чисел.
+    :rtype: list[int]
+
+    :example:
+    >>> mask_batch([5, 6], [2, 3], 3, 55) == [mask(5, 2, 3, 55), mask(6, 3, 3, 55)]
+    True
+    """
+
+    if masked_factors is None:
+        masked_factors = mask_factors(masking_factors, e, n)
+    return [msg * factor % n for msg, factor in zip(int_msg, masked_factors)]
+
+
+def demask_batch(int_msg: list[int], masking_factors: list[int], n: int,
+                 inverses: list[int] | None = None) -> list[int]:
+    """Демаскирование списка чисел; обратные множители вычисляются
+    одним обращением (:py:func:`inverse_batch`). Результат совпадает с
+    :py:func:`demask` для каждой пары.
+
+    :param list[int] int_msg: числа для демаскирования.
+    :param list[int] masking_factors: маскирующие множители.
+    :param int n: вторая часть открытого ключа RSA.
+    :param list[int] inverses: заранее вычисленные обратные множители.
+    :return: список демаскированных чисел.
+    :rtype: list[int]
+
+    :example:
+    >>> demask_batch([5, 6], [2, 3], 55) == [demask(5, 2, 55), demask(6, 3, 55)]
+    True
+    """
+
+    if inverses is None:
+        inverses = inverse_batch(masking_factors, n)
+    return [msg * inverse % n for msg, inverse in zip(int_msg, inverses)]
 
 
 def sign(int_msg: int, d: int, n: int) -> int:
@@ -118,6 +245,62 @@ def sign_list(int_msg: list[int], d: int, n: int) -> list[int]:
     return [sign(i, d, n) for i in int_msg]
 
 
+def _sign_crt(int_msg: int, p: int, q: int, exp1: int, exp2: int, coef: int) -> int:
+    m_1 = pow(int_msg % p, exp1, p)
+    m_2 = pow(int_msg % q, exp2, q)
+    return m_2 + (coef * (m_1 - m_2) % p) * q
+
+
+def sign_crt(int_msg: int, private_key: "rsa.PrivateKey", blinding: bool = False) -> int:
+    """Криптографическая подпись числа алгоритмом RSA с использованием
+    китайской теоремы об остатках: вместо ``pow(m, d, n)`` выполняются два
+    возведения в степень по модулям ``p`` и ``q`` половинной длины.
+    Результат совпадает с :py:func:`sign()`.
+
+    :param int int_msg: сообщение для подписи.
+    :param rsa.PrivateKey private_key: закрытый ключ RSA с параметрами
+        ``p``, ``q``, ``exp1``, ``exp2``, ``coef``.
+    :param bool blinding: маскировать сообщение случайным множителем перед
+        подписью (защита от атак по времени выполнения).
+    :return: подписанное число.
+    :rtype: int
+
+    :example:
+    >>> import rsa
+    >>> key = rsa.PrivateKey(3233, 17, 2753, 61, 53)
+    >>> sign_crt(65, key) == sign(65, 2753, 3233)
+    True
+    >>> sign_crt(65, key, blinding=True) == sign(65, 2753, 3233)
+    True
+    """
+
+    p, q, n = private_key.p, private_key.q, private_key.n
+    if not blinding:
+        return _sign_crt(int_msg, p, q, private_key.exp1, private_key.exp2, private_key.coef)
+    blind_factor = gcd_and_simpl(n)
+    blinded = int_msg * pow(blind_factor, private_key.e, n) % n
+    signed = _sign_crt(blinded, p, q, private_key.exp1, private_key.exp2, private_key.coef)
+    return signed * pow(blind_factor, -1, n) % n
+
+
+def sign_list_crt(int_msg: list[int], private_key: "rsa.PrivateKey", blinding: bool = False) -> list[int]:
+    """Криптографическая подпись списка чисел с использованием китайской
+    теоремы об остатках. Параметры CRT извлекаются из ключа один раз на весь
+    пакет. Результат совпадает с :py:func:`sign_list()`.
+
+    :param list[int] int_msg: сообщение для подписи, представленное списком чисел.
+    :param rsa.PrivateKey private_key: закрытый ключ RSA.
+    :param bool blinding: маскировать каждое сообщение случайным множителем.
+    :return: список подписанных чисел.
+    :rtype: list[int]
+    """
+
+    if blinding:
+        return [sign_crt(i, private_key, blinding=True) for i in int_msg]
+    p, q, exp1, exp2, coef = private_key.p, private_key.q, private_key.exp1, private_key.exp2, private_key.coef
+    return [_sign_crt(i, p, q, exp1, exp2, coef) for i in int_msg]
+
+
 def unsign(int_msg: int, e: int, n: int) -> int:
     """Снимает криптографическую подпись RSA. Поддерживаются очень большие простые чисела
 
@@ -148,30 +331,159 @@ def unsign_list(int_msg: list[int], e: int, n: int) -> list[int]:
     return [unsign(i, e, n) for i in int_msg]
 
 
+def unsign_check_batch(int_msg: list[int], expected: list[int], e: int, n: int) -> bool:
+    """Проверка пакета подписей RSA: подпись каждого числа проверяется
+    отдельно, ``s_i^e == m_i (mod n)``. Проверка произведений не
+    используется: при малой экспоненте (например, 65537) она не быстрее
+    поштучной, а неверные подписи в ней компенсируют друг друга. Для снятия
+    подписи с отдельных чисел используется :py:func:`unsign_list()`.
+
+    :param list[int] int_msg: список подписанных чисел.
+    :param list[int] expected: список ожидаемых чисел со снятой подписью.
+    :param int e: открытая экспонента, первая часть открытого ключа RSA.
+    :param int n: простое число, вторая часть открытого ключа RSA.
+    :return: ``True``, если все подписи прошли проверку.
+    :rtype: bool
+
+    :example:
+    >>> signed = [pow(m, 3, 55) for m in (2, 7, 9)]
+    >>> unsign_check_batch(signed, [2, 7, 9], 27, 55)
+    True
+    >>> unsign_check_batch(signed, [2, 7, 8], 27, 55)
+    False
+    >>> unsign_check_batch([signed[1], signed[0], signed[2]], [2, 7, 9], 27, 55)
+    False
+    >>> unsign_check_batch([55 - signed[0], 55 - signed[1], signed[2]], [2, 7, 9], 27, 55)
+    False
+    """
+
+    if len(int_msg) != len(expected):
+        return False
+    return all(pow(signed, e, n) == msg % n for signed, msg in zip(int_msg, expected))
+
+
 def generate_iden_num(l: int) -> int:
-    """Генерирует число заданной длины.
+    """Генерирует идентификационный номер — равномерно распределённое
+    случайное число из ``l`` десятичных цифр (допускаются ведущие нули),
+    т. е. из ``[0, 10^l)``. Используется CSPRNG (:py:mod:`secrets`).
 
     :param l: длина необходимого числа.
     :return: сгенерированное число.
     :rtype: int
+
+    :example:
+    >>> 0 <= generate_iden_num(100) < 10 ** 100
+    True
     """
-    letters = string.digits
-    return int(''.join(choice(letters) for _ in range(l)))
 
+    return secrets.randbelow(10 ** l)
 
-def pack_I_n_id(I, n_id) -> int:
-    postfix = ("0"*20 + str(n_id))[-20:]
-    E_I_n_id = str(I) + postfix
-    return int(E_I_n_id)
 
+def generate_iden_num_batch(l: int, count: int) -> list[int]:
+    """Генерирует ``count`` идентификационных номеров длины ``l``
+    (см. :py:func:`generate_iden_num`). Случайные байты для всего пакета
+    читаются из :py:func:`os.urandom` одним буфером, значения выбираются
+    методом отбраковки.
 
-def unpack_I_n_id(E_I_n_id):
-    I = int(str(E_I_n_id)[:-20])
-    n_id = int(str(E_I_n_id)[-20:])
-    return I, n_id
+    :param int l: длина чисел.
+    :param int count: количество чисел.
+    :return: список случайных чисел из ``[0, 10^l)``.
+    :rtype: list[int]
+
+    :example:
+    >>> iden_nums = generate_iden_num_batch(100, 50)
+    >>> len(iden_nums), all(0 <= i < 10 ** 100 for i in iden_nums)
+    (50, True)
+    """
+
+    bound = 10 ** l
+    bits = bound.bit_length()
+    width = (bits + 7) // 8
+    shift = width * 8 - bits
+    iden_nums = []
+    while len(iden_nums) < count:
+        # с запасом на отбраковку: вероятность принять значение больше 1/2
+        need = count - len(iden_nums)
+        buffer = os.urandom(width * (2 * need + 8))
+        for offset in range(0, len(buffer), width):
+            iden_num = int.from_bytes(buffer[offset:offset + width], "big") >> shift
+            if iden_num < bound:
+                iden_nums.append(iden_num)
+                if len(iden_nums) == count:
+                    break
+    return iden_nums
+
+
+N_ID_DIGITS = 20
+N_ID_BITS = 64
+_N_ID_BASE = 10 ** N_ID_DIGITS
+_N_ID_MASK = (1 << N_ID_BITS) - 1
+
+
+def pack_I_n_id(I: int, n_id: int) -> int:
+    """Упаковывает идентификационный номер и номер избирателя в одно число:
+    к десятичной записи ``I`` дописываются 20 десятичных разрядов ``n_id``.
+    Вычисляется арифметически, без преобразования в строку.
+
+    :param int I: идентификационный номер (замаскированный).
+    :param int n_id: номер избирателя.
+    :return: упакованное число.
+    :rtype: int
+
+    :example:
+    >>> pack_I_n_id(123, 15)
+    12300000000000000000015
+    """
+
+    return I * _N_ID_BASE + n_id % _N_ID_BASE
+
+
+def unpack_I_n_id(E_I_n_id: int) -> tuple[int, int]:
+    """Распаковывает число, полученное из :py:func:`pack_I_n_id()`.
+
+    :param int E_I_n_id: упакованное число.
+    :return: ``(I, n_id)``.
+    :rtype: tuple[int, int]
+
+    :example:
+    >>> unpack_I_n_id(12300000000000000000015)
+    (123, 15)
+    """
+
+    return divmod(E_I_n_id, _N_ID_BASE)
+
+
+def pack_I_n_id_bits(I: int, n_id: int) -> int:
+    """Двоичная упаковка: ``n_id`` занимает младшие 64 бита. Используется
+    при двоичном кодировании целых чисел протокола.
+
+    :param int I: идентификационный номер (замаскированный).
+    :param int n_id: номер избирателя.
+    :return: упакованное число.
+    :rtype: int
+
+    :example:
+    >>> unpack_I_n_id_bits(pack_I_n_id_bits(123, 15))
+    (123, 15)
+    """
+
+    return (I << N_ID_BITS) | (n_id & _N_ID_MASK)
+
+
+def unpack_I_n_id_bits(E_I_n_id: int) -> tuple[int, int]:
+    """Распаковывает число, полученное из :py:func:`pack_I_n_id_bits()`.
+
+    :param int E_I_n_id: упакованное число.
+    :return: ``(I, n_id)``.
+    :rtype: tuple[int, int]
+    """
+
+    return E_I_n_id >> N_ID_BITS, E_I_n_id & _N_ID_MASK
 
 
 if __name__ == '__main__':
+    import rsa
+
     # Generate RSA keys
     izb_public_key, izb_private_key = rsa.newkeys(512)
     b_izb_public_key, b_izb_private_key = rsa.newkeys(1024)
@@ -0,0 +1,137 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import sym_crypt
+from settings import load_env
+
+
+class SessionCache:
+    """Кэш параметров сессий избирателей для возобновления после разрыва
+    соединения. Записи вытесняются по истечении ``ttl`` и по принципу LRU
+    при превышении ``max_entries``. При заданных ``path`` и ``passphrase``
+    кэш хранится на диске в зашифрованном виде (:py:mod:`sym_crypt`).
+
+    :param str path: путь к файлу кэша; ``None`` — только в памяти.
+    :param str passphrase: парольная фраза для шифрования файла кэша.
+    :param float ttl: время жизни записи в секундах.
+    :param int max_entries: максимальное число записей.
+    """
+
+    def __init__(self, path: str | None = None, passphrase: str | None = None,
+                 ttl: float = 900.0, max_entries: int = 1024):
+        self.path = path
+        self.passphrase = passphrase
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+        self._entries = OrderedDict()  # key -> (expires, data)
+        self._lock = threading.Lock()
+        self._salt = None
+        self._file_key = None
+
+        # metrics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+
+        self.load()
+
+    @classmethod
+    def from_env(cls) -> "SessionCache":
+        load_env()
+        return cls(path=os.getenv("SESSION_CACHE_PATH") or None,
+                   passphrase=os.getenv("SESSION_CACHE_KEY") or None,
+                   ttl=float(os.getenv("SESSION_CACHE_TTL", 900)),
+                   max_entries=int(os.getenv("SESSION_CACHE_SIZE", 1024)))
+
+    @staticmethod
+    def voter_key(firstname: str, lastname: str) -> str:
+        return json.dumps([firstname, lastname])
+
+    def get(self, key: str) -> dict | None:
+        """Возвращает данные сессии или ``None``, если записи нет или она устарела."""
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.time():
+                del self._entries[key]
+                self.expired += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(entry[1])
+
+    def put(self, key: str, data: dict) -> None:
+        """Дополняет запись сессии полями ``data`` и продлевает срок её жизни."""
+
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            merged = dict(entry[1]) if entry is not None and entry[0] > time.time() else {}
+            merged.update(data)
+            self._entries[key] = (time.time() + self.ttl, merged)
+            self._evict()
+        self.save()
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            removed = self._entries.pop(key, None)
+        if removed is not None:
+            self.save()
+
+    def _evict(self) -> None:
+        now = time.time()
+        for key in [key for key, (expires, _) in self._entries.items() if expires <= now]:
+            del self._entries[key]
+            self.expired += 1
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits,
+                    "misses": self.misses,
+                    "evictions": self.evictions,
+                    "expired": self.expired,
+                    "entries": len(self._entries)}
+
+    def load(self) -> None:
+        if not self.path or not self.passphrase or not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as file:
+            blob = file.read()
+        try:
+            self._derive_file_key(blob[:sym_crypt.SALT_LEN])
+            entries = json.loads(sym_crypt.decrypt(self._file_key, blob[sym_crypt.SALT_LEN:]))
+        except ValueError:
+            return  # повреждённый кэш или другая парольная фраза: начинаем с пустого
+        with self._lock:
+            for key, expires, data in entries:
+                self._entries[key] = (expires, data)
+            self._evict()
+
+    def _derive_file_key(self, salt: bytes) -> None:
+        # ключ файла выводится один раз: PBKDF2 слишком дорог для каждой записи
+        self._salt = salt
+        self._file_key = sym_crypt.derive_key(self.passphrase, salt)
+
+    def save(self) -> None:
+        # без парольной фразы кэш на диск не пишется: в нём закрытые ключи
+        if not self.path or not self.passphrase:
+            return
+        with self._lock:
+            entries = [[key, expires, data] for key, (expires, data) in self._entries.items()]
+        if self._file_key is None:
+            self._derive_file_key(os.urandom(sym_crypt.SALT_LEN))
+        blob = self._salt + sym_crypt.encrypt(self._file_key, json.dumps(entries).encode())
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(blob)
+        os.replace(tmp_path, self.path)
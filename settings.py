@@ -0,0 +1,16 @@
+import functools
+
+
+@functools.cache
+def load_env() -> None:
+    """Однократно загружает переменные окружения из ``.env``.
+
+    :py:mod:`dotenv` импортируется только при первом вызове; если пакет не
+    установлен, используются переменные окружения процесса.
+    """
+
+    try:
+        from dotenv import load_dotenv
+    except ImportError:
+        return
+    load_dotenv()
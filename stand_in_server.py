@@ -0,0 +1,333 @@
+import argparse
+import base64
+import itertools
+import os
+import secrets
+import socketserver
+import threading
+
+import rsa
+
+import sym_crypt
+from envelope import ENCRYPTION_HYBRID, CLIENT_TO_SERVER, SERVER_TO_CLIENT, wrap_key, seal, unseal
+from framing import MessageStream, FRAMING_MODES, FRAMING_RAW
+from json_keys import JsonKeys as jk
+from rev_crypt import sign_crt, sign_list_crt, unsign, unsign_list
+from settings import load_env
+from wire_codec import CODECS, DecimalCodec, int_width
+
+# env
+load_env()
+
+IDEN_NUM_LEN = 100
+
+
+class StandInState:
+    """Общее состояние локального сервера: ключи сервера и база избирателей.
+
+    :param int key_len: длина ключа сервера для обмена и слепой подписи.
+    :param int blind_key_len: длина «слепого» ключа сервера.
+    :param int iden_num_len: длина идентификационного номера.
+    """
+
+    def __init__(self, key_len: int, blind_key_len: int, iden_num_len: int = IDEN_NUM_LEN):
+        self.public_key, self.private_key = rsa.newkeys(key_len)
+        self.blind_public_key, self.blind_private_key = rsa.newkeys(blind_key_len)
+        self.iden_num_len = iden_num_len
+
+        self.voters = {}  # (firstname, lastname) -> [password, n_id]
+        self.signed = {}  # n_id -> подтверждение подписи
+        self.sessions = {}  # session_token -> параметры сессии для возобновления
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "StandInState":
+        return cls(int(os.getenv("RSA_KEY_LEN")), int(os.getenv("RSA_BLIND_KEY_LEN")))
+
+    def register(self, firstname: str, lastname: str, password: str) -> str:
+        with self._lock:
+            if (firstname, lastname) in self.voters:
+                return "Voter exists"
+            self.voters[(firstname, lastname)] = [password, next(self._ids)]
+            return "Successful"
+
+    def voter(self, firstname: str, lastname: str) -> list | None:
+        with self._lock:
+            return self.voters.get((firstname, lastname))
+
+    def confirm(self, n_id: int, check: bool) -> None:
+        with self._lock:
+            self.signed[n_id] = check
+            for session in self.sessions.values():
+                if session["n_id"] == n_id:
+                    session["stage"] = jk.BLIND_SIGN_CONFIRM
+
+    def open_session(self, session: dict) -> str:
+        token = secrets.token_hex(16)
+        with self._lock:
+            self.sessions[token] = dict(session, stage=jk.BLIND_SIGN)
+        return token
+
+    def session(self, token: str) -> dict | None:
+        with self._lock:
+            return self.sessions.get(token)
+
+
+class StandInSession:
+    """Серверная сторона протокола для одной сессии избирателя.
+
+    :param StandInState state: общее состояние сервера.
+    """
+
+    def __init__(self, state: StandInState):
+        self.state = state
+        self.client_public_key = None
+        self.client_blind_public_key = None
+        self.n_id = None
+        self.codec = DecimalCodec
+        self.session_key = None  # сеансовый ключ в гибридном режиме шифрования
+        self.send_sequence = 0  # номера следующих зашифрованных сообщений, см. set_session_key()
+        self.recv_sequence = 0
+        self.handlers = {jk.KEY_EXCHANGE: self.key_exchange_handler,
+                         jk.BLIND_KEY_EXCHANGE: self.blind_key_exchange_handler,
+                         jk.REGISTRATION: self.registration_handler,
+                         jk.AUTENTICATION: self.authentication_handler,
+                         jk.RESUME: self.resume_handler,
+                         jk.CRYPT_STAGE_1_INIT: self.crypt_params_handler,
+                         jk.BLIND_SIGN: self.blind_sign_handler,
+                         jk.BLIND_SIGN_BATCH: self.blind_sign_batch_handler,
+                         jk.BLIND_SIGN_CONFIRM_REQUEST: self.blind_sign_confirm_handler,
+                         None: self.blind_sign_confirm_handler}
+
+    def handle(self, request: dict) -> dict | None:
+        encrypted = jk.ENCRYPTED in request
+        if encrypted:
+            try:
+                # повторённое или переставленное сообщение не проходит проверку имитовставки
+                request = unseal(self.session_key, request, CLIENT_TO_SERVER, self.recv_sequence)
+            except (TypeError, ValueError):
+                return {jk.REQUEST: jk.FAILED}
+            self.recv_sequence += 1
+        response = self.handlers.get(request.get(jk.REQUEST), self.unknown_handler)(request)
+        # ответ шифруется, если был зашифрован запрос
+        if response is not None and encrypted:
+            response = seal(self.session_key, response, SERVER_TO_CLIENT, self.send_sequence)
+            self.send_sequence += 1
+        return response
+
+    def set_session_key(self, key: bytes | None) -> None:
+        self.session_key = key
+        self.send_sequence = 0
+        self.recv_sequence = 0
+
+    def issue_session_key(self, response: dict) -> dict:
+        """Выдаёт новый сеансовый ключ, зашифрованный открытым ключом клиента."""
+
+        self.set_session_key(sym_crypt.generate_key())
+        response[jk.ENCRYPTION] = ENCRYPTION_HYBRID
+        response[jk.SESSION_KEY] = wrap_key(self.session_key, self.client_public_key)
+        return response
+
+    def decrypt_password(self, request: dict) -> str:
+        if self.session_key is not None:
+            return request[jk.PASSWORD]  # сообщение целиком уже расшифровано
+        return rsa.decrypt(base64.b64decode(request[jk.PASSWORD]), self.state.private_key).decode()
+
+    def key_exchange_handler(self, request: dict) -> dict:
+        # новый обмен ключами начинает сессию заново: прежние аутентификация и ключи не действуют
+        self.client_blind_public_key = None
+        self.n_id = None
+        self.codec = DecimalCodec
+        self.set_session_key(None)
+        self.client_public_key = rsa.PublicKey(int(request[jk.KEYEX_CLIENT_PUB_N]),
+                                               int(request[jk.KEYEX_CLIENT_PUB_E]))
+        response = {jk.KEYEX_SERVER_PUB_N: str(self.state.public_key.n),
+                    jk.KEYEX_SERVER_PUB_E: str(self.state.public_key.e)}
+        if request.get(jk.INT_ENCODING) in CODECS:
+            self.codec = CODECS[request[jk.INT_ENCODING]]
+            response[jk.INT_ENCODING] = self.codec.name
+        if request.get(jk.ENCRYPTION) == ENCRYPTION_HYBRID:
+            self.issue_session_key(response)
+        return response
+
+    def blind_key_exchange_handler(self, request: dict) -> dict:
+        self.client_blind_public_key = rsa.PublicKey(int(request[jk.KEYEX_CLIENT_PUB_N]),
+                                                     int(request[jk.KEYEX_CLIENT_PUB_E]))
+        return {jk.KEYEX_SERVER_PUB_N: str(self.state.blind_public_key.n),
+                jk.KEYEX_SERVER_PUB_E: str(self.state.blind_public_key.e)}
+
+    def registration_handler(self, request: dict) -> dict:
+        return {jk.REG_STATE: self.state.register(request[jk.FIRSTNAME],
+                                                  request[jk.LASTNAME],
+                                                  self.decrypt_password(request))}
+
+    def authentication_handler(self, request: dict) -> dict:
+        voter = self.state.voter(request[jk.FIRSTNAME], request[jk.LASTNAME])
+        auth = voter is not None and voter[0] == self.decrypt_password(request)
+        self.n_id = voter[1] if auth else None
+        if not auth:
+            return {jk.AUTH_STATE: str(auth)}
+        token = self.state.open_session({"client_public_key": self.client_public_key,
+                                         "client_blind_public_key": self.client_blind_public_key,
+                                         "n_id": self.n_id,
+                                         "codec": self.codec,
+                                         "encryption": ENCRYPTION_HYBRID if self.session_key else None})
+        return {jk.AUTH_STATE: str(auth), jk.SESSION_TOKEN: token}
+
+    def resume_handler(self, request: dict) -> dict:
+        session = self.state.session(request.get(jk.SESSION_TOKEN))
+        if session is None:
+            return {jk.RESUME_STATE: jk.FAILED}
+        self.client_public_key = session["client_public_key"]
+        self.client_blind_public_key = session["client_blind_public_key"]
+        self.n_id = session["n_id"]
+        self.codec = session["codec"]
+        response = {jk.RESUME_STATE: session["stage"]}
+        if session["encryption"] != ENCRYPTION_HYBRID:
+            self.set_session_key(None)
+            return response
+        # ключ прежнего соединения не возобновляется: сообщения из него нельзя повторить
+        return self.issue_session_key(response)
+
+    def crypt_params_handler(self, request: dict) -> dict:
+        voter = self.state.voter(request[jk.FIRSTNAME], request[jk.LASTNAME])
+        return {jk.VOTER_ID: voter[1] if voter else None,
+                jk.IDEN_NUM_LEN: self.state.iden_num_len}
+
+    def blind_sign_handler(self, request: dict) -> dict:
+        cryptogramm_I_n_id, n_id = request[jk.BLIND_MASK_IDEN_NUM]
+        try:
+            packed = unsign(self.codec.decode(cryptogramm_I_n_id),
+                            self.client_blind_public_key.e,
+                            self.client_blind_public_key.n)
+        except ValueError:
+            return {jk.BLIND_SIGN_RESPONSE: jk.FAILED}
+        masked_iden_num, packed_n_id = self.codec.unpack_I_n_id(packed)
+        if self.n_id is None or packed_n_id != n_id or n_id != self.n_id:
+            return {jk.BLIND_SIGN_RESPONSE: jk.FAILED}
+        return {jk.BLIND_SIGN_RESPONSE: self.codec.encode(sign_crt(masked_iden_num, self.state.private_key),
+                                                          int_width(self.state.private_key.n))}
+
+    def blind_sign_batch_handler(self, request: dict) -> dict:
+        M_1_batch = request[jk.BLIND_MASK_IDEN_NUM]
+        try:
+            unsigned = unsign_list([self.codec.decode(cryptogramm_I_n_id) for cryptogramm_I_n_id, _ in M_1_batch],
+                                   self.client_blind_public_key.e,
+                                   self.client_blind_public_key.n)
+        except ValueError:
+            return {jk.BLIND_SIGN_RESPONSE: jk.FAILED}
+        masked_iden_nums = []
+        for (_, n_id), packed in zip(M_1_batch, unsigned):
+            masked_iden_num, packed_n_id = self.codec.unpack_I_n_id(packed)
+            if self.n_id is None or packed_n_id != n_id or n_id != self.n_id:
+                return {jk.BLIND_SIGN_RESPONSE: jk.FAILED}
+            masked_iden_nums.append(masked_iden_num)
+        width = int_width(self.state.private_key.n)
+        return {jk.BLIND_SIGN_RESPONSE: [self.codec.encode(signed, width)
+                                         for signed in sign_list_crt(masked_iden_nums, self.state.private_key)]}
+
+    def blind_sign_confirm_handler(self, request: dict) -> None:
+        if self.n_id is not None:
+            self.state.confirm(self.n_id, request.get(jk.BLIND_SIGN_CONFIRM))
+        return None
+
+    def unknown_handler(self, request: dict) -> dict:
+        return {jk.REQUEST: jk.FAILED}
+
+
+class StandInHandler(socketserver.BaseRequestHandler):
+    """Одно соединение с сервером: согласование кадрирования и, в
+    мультиплексированном режиме, маршрутизация сообщений по сессиям."""
+
+    def setup(self):
+        self.stream = MessageStream(self.request)
+        self.state: StandInState = self.server.state
+        self.session = StandInSession(self.state)
+        self.sessions = None  # session_id -> StandInSession в мультиплексированном режиме
+
+    def handle(self):
+        while True:
+            try:
+                request = self.stream.recv_json()
+            except (ConnectionError, OSError):
+                return
+            kind = request.get(jk.REQUEST)
+            if kind == jk.FRAMING:
+                mode = request.get(jk.FRAMING_MODE)
+                mode = mode if mode in FRAMING_MODES else FRAMING_RAW
+                self.stream.send_json({jk.FRAMING_MODE: mode})
+                self.stream.set_mode(mode)
+                continue
+            if kind == jk.SESSION_RESET:
+                # клиент будет завершать сессию через SESSION_CLOSE, не закрывая соединение
+                self.session = StandInSession(self.state)
+                self.stream.send_json({jk.SESSION_RESET_STATE: jk.SUCCESSFUL})
+                continue
+            if kind == jk.MULTIPLEX:
+                self.sessions = {}
+                self.stream.send_json({jk.MULTIPLEX_STATE: jk.SUCCESSFUL})
+                continue
+            if self.sessions is None and kind == jk.SESSION_CLOSE:
+                # соединение возвращено в пул клиента: следующая сессия начинается с чистого состояния
+                self.session = StandInSession(self.state)
+                continue
+            if self.sessions is None:
+                response = self.session.handle(request)
+            else:
+                response = self.multiplexed_handler(request)
+            if response is not None:
+                self.stream.send_json(response)
+
+    def multiplexed_handler(self, request: dict) -> dict | None:
+        session_id = request.pop(jk.SESSION_ID, None)
+        if request.get(jk.REQUEST) == jk.SESSION_CLOSE:
+            self.sessions.pop(session_id, None)
+            return None
+        session = self.sessions.get(session_id)
+        if session is None:
+            session = self.sessions[session_id] = StandInSession(self.state)
+        response = session.handle(request)
+        if response is not None:
+            response[jk.SESSION_ID] = session_id
+        return response
+
+
+class StandInServer(socketserver.ThreadingTCPServer):
+    """Локальный сервер-заглушка, реализующий серверную сторону протокола
+    на основе :py:mod:`rev_crypt`. Предназначен для нагрузочного тестирования.
+
+    :param tuple address: адрес ``(host, port)``; порт ``0`` — любой свободный.
+    :param StandInState state: состояние сервера; по умолчанию создаётся из ``.env``.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 1024
+
+    def __init__(self, address: tuple[str, int], state: StandInState | None = None):
+        self.state = state or StandInState.from_env()
+        super().__init__(address, StandInHandler)
+
+
+def start_in_thread(host: str = "127.0.0.1", port: int = 0,
+                    state: StandInState | None = None) -> StandInServer:
+    """Запускает сервер-заглушку в фоновом потоке.
+
+    :return: запущенный сервер; адрес — ``server.server_address``.
+    :rtype: StandInServer
+    """
+
+    server = StandInServer((host, port), state)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="REV stand-in server")
+    parser.add_argument("--host", default=os.getenv("HOST"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT")))
+    args = parser.parse_args()
+
+    with StandInServer((args.host, args.port)) as stand_in:
+        stand_in.serve_forever()
@@ -0,0 +1,121 @@
+import hashlib
+import hmac
+import os
+
+KEY_LEN = 32
+NONCE_LEN = 16
+SALT_LEN = 16
+TAG_LEN = 32
+KDF_ITERATIONS = 200_000
+
+
+def generate_key() -> bytes:
+    """Генерирует случайный симметричный ключ.
+
+    :return: ключ длиной :py:data:`KEY_LEN` байт.
+    :rtype: bytes
+    """
+
+    return os.urandom(KEY_LEN)
+
+
+def derive_key(passphrase: str, salt: bytes) -> bytes:
+    """Получает симметричный ключ из парольной фразы (PBKDF2-HMAC-SHA256).
+
+    :param str passphrase: парольная фраза.
+    :param bytes salt: соль.
+    :return: ключ длиной :py:data:`KEY_LEN` байт.
+    :rtype: bytes
+    """
+
+    return hashlib.pbkdf2_hmac("sha256", passphrase.encode(), salt, KDF_ITERATIONS, KEY_LEN)
+
+
+def _subkeys(key: bytes) -> tuple[bytes, bytes]:
+    enc_key = hashlib.sha256(b"enc" + key).digest()
+    mac_key = hashlib.sha256(b"mac" + key).digest()
+    return enc_key, mac_key
+
+
+def _xor_keystream(enc_key: bytes, nonce: bytes, data: bytes) -> bytes:
+    if not data:
+        return b""
+    keystream = hashlib.shake_256(enc_key + nonce).digest(len(data))
+    return (int.from_bytes(data, "big") ^ int.from_bytes(keystream, "big")).to_bytes(len(data), "big")
+
+
+def encrypt(key: bytes, data: bytes, associated: bytes = b"") -> bytes:
+    """Аутентифицированное шифрование: поточный шифр на SHAKE-256
+    и имитовставка HMAC-SHA256 по схеме encrypt-then-MAC.
+
+    :param bytes key: симметричный ключ.
+    :param bytes data: открытые данные.
+    :param bytes associated: дополнительные данные, защищаемые только имитовставкой.
+    :return: ``nonce + шифртекст + tag``.
+    :rtype: bytes
+
+    :example:
+    >>> key = bytes(32)
+    >>> decrypt(key, encrypt(key, b"secret"))
+    b'secret'
+    """
+
+    enc_key, mac_key = _subkeys(key)
+    nonce = os.urandom(NONCE_LEN)
+    cipher = _xor_keystream(enc_key, nonce, data)
+    tag = hmac.new(mac_key, associated + nonce + cipher, hashlib.sha256).digest()
+    return nonce + cipher + tag
+
+
+def decrypt(key: bytes, blob: bytes, associated: bytes = b"") -> bytes:
+    """Расшифровывает данные, полученные из :py:func:`encrypt()`.
+
+    :param bytes key: симметричный ключ.
+    :param bytes blob: ``nonce + шифртекст + tag``.
+    :param bytes associated: дополнительные данные, переданные при шифровании.
+    :return: открытые данные.
+    :rtype: bytes
+    :raises ValueError: при неверной имитовставке или повреждённых данных.
+
+    :example:
+    >>> decrypt(bytes(32), encrypt(bytes(32), b"secret") + b"x")
+    Traceback (most recent call last):
+    ...
+    ValueError: authentication failed
+    """
+
+    if len(blob) < NONCE_LEN + TAG_LEN:
+        raise ValueError("ciphertext too short")
+    enc_key, mac_key = _subkeys(key)
+    nonce, cipher, tag = blob[:NONCE_LEN], blob[NONCE_LEN:-TAG_LEN], blob[-TAG_LEN:]
+    expected = hmac.new(mac_key, associated + nonce + cipher, hashlib.sha256).digest()
+    if not hmac.compare_digest(tag, expected):
+        raise ValueError("authentication failed")
+    return _xor_keystream(enc_key, nonce, cipher)
+
+
+def encrypt_with_passphrase(passphrase: str, data: bytes) -> bytes:
+    """Шифрует данные ключом, полученным из парольной фразы.
+
+    :param str passphrase: парольная фраза.
+    :param bytes data: открытые данные.
+    :return: ``salt + encrypt(...)``.
+    :rtype: bytes
+    """
+
+    salt = os.urandom(SALT_LEN)
+    return salt + encrypt(derive_key(passphrase, salt), data)
+
+
+def decrypt_with_passphrase(passphrase: str, blob: bytes) -> bytes:
+    """Расшифровывает данные, полученные из :py:func:`encrypt_with_passphrase()`.
+
+    :param str passphrase: парольная фраза.
+    :param bytes blob: ``salt + encrypt(...)``.
+    :return: открытые данные.
+    :rtype: bytes
+    :raises ValueError: при неверной парольной фразе или повреждённых данных.
+    """
+
+    salt = blob[:SALT_LEN]
+    return decrypt(derive_key(passphrase, salt), blob[SALT_LEN:])
@@ -0,0 +1,84 @@
+import base64
+
+from rev_crypt import pack_I_n_id, unpack_I_n_id, pack_I_n_id_bits, unpack_I_n_id_bits
+
+INT_DECIMAL = "decimal"  # протокол по умолчанию: целые числа JSON
+INT_BASE64 = "base64"  # big-endian байты фиксированной длины в base64
+
+
+def int_width(n: int) -> int:
+    """Число байтов, достаточное для любого вычета по модулю ``n``.
+
+    :example:
+    >>> int_width(2 ** 1024 - 1)
+    128
+    """
+
+    return (n.bit_length() + 7) // 8
+
+
+def int_to_bytes(value: int, width: int) -> bytes:
+    """Big-endian представление числа фиксированной длины ``width`` байтов.
+
+    :example:
+    >>> int_to_bytes(258, 4)
+    b'\\x00\\x00\\x01\\x02'
+    """
+
+    return value.to_bytes(width, "big")
+
+
+def int_from_bytes(data: bytes) -> int:
+    """
+    :example:
+    >>> int_from_bytes(b'\\x00\\x00\\x01\\x02')
+    258
+    """
+
+    return int.from_bytes(data, "big")
+
+
+class DecimalCodec:
+    """Прежнее кодирование: числа передаются как есть, упаковка ``I`` и
+    ``n_id`` — десятичная (:py:func:`rev_crypt.pack_I_n_id`)."""
+
+    name = INT_DECIMAL
+
+    @staticmethod
+    def encode(value: int, width: int) -> int:
+        return value
+
+    @staticmethod
+    def decode(value: int | str) -> int:
+        return int(value)
+
+    pack_I_n_id = staticmethod(pack_I_n_id)
+    unpack_I_n_id = staticmethod(unpack_I_n_id)
+
+
+class Base64Codec:
+    """Компактное кодирование: число — big-endian байты длины модуля в base64,
+    упаковка ``I`` и ``n_id`` — двоичная (:py:func:`rev_crypt.pack_I_n_id_bits`).
+
+    :example:
+    >>> Base64Codec.encode(2 ** 64 + 1, 9)
+    'AQAAAAAAAAAB'
+    >>> Base64Codec.decode(Base64Codec.encode(2 ** 64 + 1, 9))
+    18446744073709551617
+    """
+
+    name = INT_BASE64
+
+    @staticmethod
+    def encode(value: int, width: int) -> str:
+        return base64.b64encode(int_to_bytes(value, width)).decode()
+
+    @staticmethod
+    def decode(value: str) -> int:
+        return int_from_bytes(base64.b64decode(value))
+
+    pack_I_n_id = staticmethod(pack_I_n_id_bits)
+    unpack_I_n_id = staticmethod(unpack_I_n_id_bits)
+
+
+CODECS = {codec.name: codec for codec in (DecimalCodec, Base64Codec)}